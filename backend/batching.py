@@ -0,0 +1,107 @@
+"""
+batching.py
+Dynamic micro-batching for the Keras models.
+Concurrent requests each submit one sample; a background thread gathers them
+into a single batch (up to max_batch_size items or max_wait_ms) and runs one
+forward pass, then hands every caller its own row of the output.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Queue in front of a batch predict function
+
+    Args:
+        predict_fn: callable taking an array of shape (batch, *sample_shape)
+                    and returning an array with one output row per sample
+        max_batch_size: largest batch handed to predict_fn
+        max_wait_ms: how long the first queued sample waits for company
+        name: thread name (shows up in stack dumps)
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, name="micro-batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, sample: np.ndarray) -> Future:
+        """Queue one sample (no batch dimension) and return a future for its output row"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            self._queue.put((np.asarray(sample), future))
+        return future
+
+    def predict(self, sample: np.ndarray, timeout=None) -> np.ndarray:
+        """Blocking helper: submit one sample and wait for its output row"""
+        return self.submit(sample).result(timeout)
+
+    def close(self):
+        """Stop the worker thread; samples still queued behind the stop marker are failed"""
+        with self._lock:
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[1].set_exception(RuntimeError("Batcher is closed"))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+
+    def _process(self, batch):
+        # Pad up to the next power of two so the model only ever sees a handful
+        # of batch shapes (avoids retracing the predict function per size)
+        size = len(batch)
+        padded = min(self.max_batch_size, 1 << (size - 1).bit_length())
+        try:
+            inputs = np.stack([sample for sample, _ in batch])
+            if padded > size:
+                pad = np.zeros((padded - size,) + inputs.shape[1:], dtype=inputs.dtype)
+                inputs = np.concatenate([inputs, pad])
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(batch):
+            future.set_result(outputs[i])
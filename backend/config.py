@@ -0,0 +1,101 @@
+"""
+config.py
+Runtime settings for the inference API.
+Every field can be overridden with an environment variable prefixed with
+GUARDRAIL_ (e.g. GUARDRAIL_SCORER_POOL_SIZE=8) or from a .env file.
+"""
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="GUARDRAIL_", env_file=".env", extra="ignore")
+
+    # Model artifacts and which of them this deployment serves
+    # (e.g. "vibration" alone skips TensorFlow and librosa entirely;
+    # add "vision" for YOLO person detection on uploaded images)
+    models_dir: str = "./models"
+    enabled_models: str = "vibration,acoustic,lstm"
+    # Load models in the background at startup; when off, each loads on first use
+    preload_models: bool = True
+    # Runtime for the CNN and LSTM: "keras", or "tflite" / "onnx" to serve the
+    # exports written by convert_models.py
+    inference_backend: str = "keras"
+    # Serve the vibration RandomForest from flat node arrays (forest_compiler.py):
+    # same probabilities as sklearn's predict_proba without its per-call overhead
+    compiled_forest: bool = True
+    # Directory of model artifacts prepared by serve.py for multi-worker serving:
+    # workers memory-map the forest, scaler and TFLite exports from it instead
+    # of loading private copies (empty: load from models_dir)
+    shared_weights_dir: str = ""
+
+    # Threads used to run the modality scorers off the event loop.
+    # Each in-flight request holds up to four of them, so this also bounds how
+    # full the Keras micro-batches can get.
+    scorer_pool_size: int = 32
+
+    # Keras micro-batching: flush a batch at this many samples or after this wait
+    batch_max_size: int = 32
+    batch_max_wait_ms: float = 5.0
+
+    # YOLO person detection ("vision" in enabled_models). Images of concurrent
+    # requests share batched forward passes; a request waits at most
+    # vision_deadline_ms for its detection, then answers with the PIR score as
+    # a provisional result and publishes the final one as a follow-up update.
+    vision_model: str = "yolo11n.pt"
+    vision_image_size: int = 640
+    vision_confidence: float = 0.25
+    vision_deadline_ms: float = 150.0
+    vision_pool_size: int = 2
+    vision_batch_max_size: int = 8
+    vision_batch_max_wait_ms: float = 10.0
+
+    # Fusion in /predict/intent: "exact" scores every modality; "cascade" scores
+    # them cheapest first (context/PIR, vibration RF, LSTM, then the CNN) and
+    # skips the rest once the alert decision and risk band can no longer change
+    fusion_mode: str = "exact"
+
+    # Mel spectrogram normalization: "clip" matches training (dB relative to the
+    # loudest frame of the whole clip); "window" decodes only the 128 frames the
+    # CNN sees and normalizes to the loudest of those
+    mel_ref_scope: str = "clip"
+
+    # Per-modality score cache for repeated payloads (0 entries disables it)
+    score_cache_size: int = 10000
+    score_cache_ttl_seconds: float = 300.0
+
+    # Per-segment LSTM windows for clients that send only new sequence samples
+    # (segment_id): segments kept, and how long an idle one keeps its samples
+    sequence_buffer_max_segments: int = 10000
+    sequence_buffer_ttl_seconds: float = 3600.0
+
+    # Fan-in of per-modality events (POST /fanin/events): readings are aligned per
+    # segment into event-time windows of fanin_window_seconds, fused once the
+    # required modalities are in or fanin_deadline_seconds after a window's first event
+    fanin_window_seconds: float = 10.0
+    fanin_deadline_seconds: float = 5.0
+    fanin_required_modalities: str = "vibration,audio,sequence,pir"
+    fanin_max_segments: int = 1000
+    fanin_max_open_windows: int = 4
+
+    # Columnar archive of every scored /predict/intent record and its raw inputs
+    # (see sensor_archive.py); empty disables it. Rows beyond archive_max_pending
+    # waiting for the writer thread are dropped rather than slowing requests down.
+    archive_dir: str = ""
+    archive_max_pending: int = 1000
+
+    # Request size limits in bytes (0: unlimited); larger requests get 413.
+    # Whole bodies are checked from Content-Length before anything is read.
+    max_request_bytes: int = 32 * 1024 * 1024
+    max_batch_request_bytes: int = 256 * 1024 * 1024
+    # Per multipart part (audio, image), enforced while the body streams in
+    max_audio_bytes: int = 16 * 1024 * 1024
+    max_image_bytes: int = 16 * 1024 * 1024
+    # Each vibration/sequence field or file
+    max_array_bytes: int = 8 * 1024 * 1024
+
+    # Upper bound on records accepted by /predict/intent/batch
+    batch_request_max_records: int = 256
+
+
+settings = Settings()
@@ -0,0 +1,99 @@
+"""
+convert_models.py
+Export the acoustic CNN and the LSTM to TFLite and/or ONNX for the
+lightweight inference backends (GUARDRAIL_INFERENCE_BACKEND=tflite|onnx).
+
+Usage:
+    python convert_models.py                          # both models, both formats
+    python convert_models.py --format tflite --check  # export and compare with Keras
+
+--check runs the Keras model and the export on the same inputs and exits
+non-zero if any output differs by more than --tolerance.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from inference_backends import EXTENSIONS, load_exported
+from main import (
+    LSTM_WINDOW,
+    MEL_SHAPE,
+    build_acoustic_model,
+    build_lstm_model,
+    model_path
+)
+
+MODELS = {
+    # name: (weights stem, builder, sample input shape, random input range)
+    "acoustic": ("acoustic_tool_detector", build_acoustic_model, MEL_SHAPE + (1,), (-80.0, 0.0)),
+    "lstm": ("lstm_sequence_predictor", build_lstm_model, (LSTM_WINDOW, 1), (0.0, 1.0)),
+}
+
+
+def load_keras(name, **kwargs):
+    stem, builder, shape, _ = MODELS[name]
+    model = builder(**kwargs)
+    model.load_weights(model_path(stem + ".h5"))
+    # The exporters need a model that has been called at least once
+    model.predict(np.zeros((1,) + shape, dtype=np.float32), verbose=0)
+    return model
+
+
+def export_tflite(name, path):
+    import tensorflow as tf
+
+    # The LSTM's symbolic time loop only converts with the Flex (Select TF ops)
+    # delegate; the unrolled copy of the same weights converts to builtin ops
+    model = load_keras(name, unroll=True) if name == "lstm" else load_keras(name)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(name, path):
+    load_keras(name).export(path, format="onnx", verbose=False)
+
+
+def check(name, backend, path, tolerance):
+    """Largest absolute difference between Keras and the export, over a few batch sizes"""
+    _, _, shape, (low, high) = MODELS[name]
+    reference = load_keras(name)
+    exported = load_exported(backend, path)
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    for batch_size in (1, 4, 32):
+        x = rng.uniform(low, high, size=(batch_size,) + shape).astype(np.float32)
+        expected = reference.predict(x, batch_size=batch_size, verbose=0)
+        worst = max(worst, float(np.abs(exported.predict(x) - expected).max()))
+    ok = worst <= tolerance
+    print(f"  {'✓' if ok else '❌'} {name} [{backend}] max abs diff {worst:.2e}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument("--format", nargs="+", choices=sorted(EXTENSIONS), default=sorted(EXTENSIONS))
+    parser.add_argument("--check", action="store_true", help="compare each export against Keras")
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    exporters = {"tflite": export_tflite, "onnx": export_onnx}
+    ok = True
+    for name in args.models:
+        stem = MODELS[name][0]
+        for backend in args.format:
+            path = model_path(stem + EXTENSIONS[backend])
+            exporters[backend](name, path)
+            print(f"✓ Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+            if args.check:
+                ok = check(name, backend, path, args.tolerance) and ok
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
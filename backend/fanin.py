@@ -0,0 +1,193 @@
+"""
+fanin.py
+Server-side fan-in of per-modality sensor events.
+In the field, vibration, audio, sequence, PIR and weather readings come from
+different devices at different rates. Instead of a gateway joining them and
+uploading one bundle per /predict/intent call, each device posts its own
+events. The aggregator aligns them per track segment into fixed event-time
+windows (timestamp // window_seconds) and hands a window over for fusion as
+soon as every required modality has arrived, or once its deadline passes
+with whatever did arrive.
+
+Everything is bounded: each segment keeps at most max_open_windows windows
+(the oldest is handed over early when another one opens) and at most
+max_segments segments are tracked (the least recently updated one is
+handed over and forgotten). Events for a window older than the segment's
+newest fused one are dropped as late. The latest fused result of each
+segment is kept, under the same segment limit.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+MODALITIES = ("vibration", "audio", "sequence", "pir", "weather")
+
+
+class FusionWindow:
+    """The readings of one segment in one event-time window"""
+
+    __slots__ = ("segment_id", "start", "end", "readings", "opened", "trigger")
+
+    def __init__(self, segment_id, start, end):
+        self.segment_id = segment_id
+        self.start = start
+        self.end = end
+        self.readings = {}          # modality -> (timestamp, value), latest event wins
+        self.opened = time.monotonic()
+        self.trigger = None         # why it was handed over: complete, deadline, overflow, evicted
+
+    def value(self, modality, default=None):
+        reading = self.readings.get(modality)
+        return default if reading is None else reading[1]
+
+    def missing(self, required) -> list:
+        return [m for m in required if m not in self.readings]
+
+    def describe(self) -> dict:
+        """Window bounds and per-modality event times, for the fused result"""
+        timestamps = [ts for ts, _ in self.readings.values()]
+        return {
+            "segment_id": self.segment_id,
+            "window": {"start": self.start, "end": self.end},
+            "trigger": self.trigger,
+            "readings": {m: ts for m, (ts, _) in self.readings.items()},
+            "event_skew_ms": round((max(timestamps) - min(timestamps)) * 1000, 1) if timestamps else 0.0
+        }
+
+
+class FanInAggregator:
+    """
+    Per-segment event-time windows, handed over for fusion when complete or late
+
+    Args:
+        window_seconds: length of the event-time windows readings are aligned to
+        deadline_seconds: how long after its first event a window waits for the
+            missing modalities before it is fused without them
+        required: modalities a window needs to be complete
+        max_segments: segments tracked at once (least recently updated evicted first)
+        max_open_windows: open windows per segment (oldest handed over first)
+    """
+
+    def __init__(self, window_seconds=10.0, deadline_seconds=5.0,
+                 required=("vibration", "audio", "sequence", "pir"),
+                 max_segments=1000, max_open_windows=4):
+        unknown = set(required) - set(MODALITIES)
+        if unknown:
+            raise ValueError(f"Unknown modalities {sorted(unknown)}, expected some of {', '.join(MODALITIES)}")
+        if window_seconds <= 0:
+            raise ValueError("Fan-in windows must be longer than 0 seconds")
+        self.window_seconds = float(window_seconds)
+        self.deadline_seconds = float(deadline_seconds)
+        self.required = tuple(required)
+        self.max_segments = max(1, int(max_segments))
+        self.max_open_windows = max(1, int(max_open_windows))
+        self._segments = OrderedDict()      # segment_id -> {window start: FusionWindow}
+        self._watermarks = OrderedDict()    # segment_id -> start of its newest fused window
+        self._results = OrderedDict()       # segment_id -> latest fused result
+        self._lock = threading.Lock()
+        self.counts = {"events": 0, "late": 0, "complete": 0, "deadline": 0, "overflow": 0, "evicted": 0}
+
+    def add(self, segment_id, modality, value, timestamp=None) -> tuple:
+        """
+        Add one reading (the latest reading of a modality in a window wins)
+
+        Returns:
+            (accepted, ready): accepted is False for a late event, ready lists the
+            windows to fuse now (the completed one, plus any pushed out to stay
+            within the bounds)
+        """
+        if modality not in MODALITIES:
+            raise ValueError(f"Unknown modality '{modality}', expected one of {', '.join(MODALITIES)}")
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        if not math.isfinite(timestamp):
+            raise ValueError(f"Timestamp must be a finite number of seconds, got {timestamp}")
+        segment_id = str(segment_id)
+        start = (timestamp // self.window_seconds) * self.window_seconds
+
+        with self._lock:
+            self.counts["events"] += 1
+            watermark = self._watermarks.get(segment_id)
+            windows = self._segments.get(segment_id)
+            if watermark is not None and start <= watermark and (windows is None or start not in windows):
+                self.counts["late"] += 1
+                return False, []
+
+            ready = []
+            if windows is None:
+                while len(self._segments) >= self.max_segments:
+                    evicted_id, evicted = self._segments.popitem(last=False)
+                    self._watermarks.pop(evicted_id, None)
+                    ready.extend(self._close(w, "evicted") for w in sorted(evicted.values(), key=lambda w: w.start))
+                windows = self._segments[segment_id] = {}
+            else:
+                self._segments.move_to_end(segment_id)
+
+            window = windows.get(start)
+            if window is None:
+                while len(windows) >= self.max_open_windows:
+                    ready.append(self._close(windows.pop(min(windows)), "overflow"))
+                window = windows[start] = FusionWindow(segment_id, start, start + self.window_seconds)
+            window.readings[modality] = (timestamp, value)
+
+            if not window.missing(self.required):
+                ready.append(self._close(windows.pop(start), "complete"))
+            return True, ready
+
+    def expired(self) -> list:
+        """Open windows whose deadline has passed, handed over for fusion"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for windows in self._segments.values():
+                for start in [s for s, w in windows.items() if now - w.opened >= self.deadline_seconds]:
+                    ready.append(self._close(windows.pop(start), "deadline"))
+            for segment_id in [s for s, windows in self._segments.items() if not windows]:
+                del self._segments[segment_id]
+        return ready
+
+    def record(self, segment_id, result: dict):
+        """Keep a segment's latest fused result"""
+        with self._lock:
+            self._results[segment_id] = result
+            self._results.move_to_end(segment_id)
+            while len(self._results) > self.max_segments:
+                self._results.popitem(last=False)
+
+    def latest(self, segment_id):
+        """A segment's latest fused result, or None"""
+        with self._lock:
+            return self._results.get(str(segment_id))
+
+    def reset(self, segment_id) -> bool:
+        """Drop a segment's open windows and results; False if it had neither"""
+        segment_id = str(segment_id)
+        with self._lock:
+            self._watermarks.pop(segment_id, None)
+            had_result = self._results.pop(segment_id, None) is not None
+            return self._segments.pop(segment_id, None) is not None or had_result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "open_windows": sum(len(w) for w in self._segments.values()),
+                "max_segments": self.max_segments,
+                "max_open_windows": self.max_open_windows,
+                "window_seconds": self.window_seconds,
+                "deadline_seconds": self.deadline_seconds,
+                "required": list(self.required),
+                **self.counts
+            }
+
+    def _close(self, window, trigger):
+        window.trigger = trigger
+        self.counts[trigger] += 1
+        segment_id = window.segment_id
+        if trigger != "evicted":
+            self._watermarks[segment_id] = max(self._watermarks.get(segment_id, window.start), window.start)
+            self._watermarks.move_to_end(segment_id)
+            while len(self._watermarks) > self.max_segments:
+                self._watermarks.popitem(last=False)
+        return window
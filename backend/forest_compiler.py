@@ -0,0 +1,269 @@
+"""
+forest_compiler.py
+Flat-array form of the vibration RandomForest.
+sklearn's predict_proba validates its input, dispatches the trees to a
+thread pool and walks each tree object in a separate call; at the batch size
+of a single request that overhead is most of the vibration latency.
+compile_forest() copies every tree into shared contiguous node arrays and
+CompiledForest walks all trees for a whole batch at once, one NumPy gather
+per tree level. Leaves point to themselves, so max_depth steps land every
+sample on its leaf without masking.
+
+The arrays are saved to a single file next to the pickle
+(models/railway_anomaly_detector.forest) that load_forest() memory-maps, so
+it loads instantly and worker processes share its pages.
+
+Usage:
+    python forest_compiler.py            # compile models/railway_anomaly_detector.pkl
+    python forest_compiler.py --check    # and compare against predict_proba
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"GRFOREST"
+FORMAT_VERSION = 1
+# Array offsets in the file are multiples of this, so every memmap is aligned
+ALIGN = 64
+# Indices are stored as int64 (np.intp) so traversal gathers with them uncast
+ARRAY_DTYPES = {
+    "roots": np.dtype("<i8"),       # first node of each tree
+    "feature": np.dtype("<i8"),     # feature tested at each node (0 at leaves)
+    "threshold": np.dtype("<f8"),   # go left when x[feature] <= threshold
+    "children": np.dtype("<i8"),    # (left, right) per node; a leaf's are itself
+    "proba": np.dtype("<f8"),       # class probabilities per node (used at leaves)
+}
+
+
+class CompiledForest:
+    """
+    predict_proba-compatible forest over flat node arrays
+
+    Probabilities match RandomForestClassifier.predict_proba bit for bit: the
+    input is cast to float32 like sklearn does, leaf probabilities are
+    normalized the same way and the trees are summed in the same order.
+    """
+
+    def __init__(self, arrays: dict, classes, n_features: int, max_depth: int, source_sha256=None):
+        self.roots = arrays["roots"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.proba = arrays["proba"]
+        self.classes_ = np.asarray(classes)
+        self.n_classes_ = len(self.classes_)
+        self.n_features_in_ = n_features
+        self.n_estimators = len(self.roots)
+        self.max_depth = max_depth
+        self.source_sha256 = source_sha256
+
+    @property
+    def arrays(self) -> dict:
+        return {name: getattr(self, name) for name in ARRAY_DTYPES}
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node index of every sample in every tree, (n_samples, n_estimators)"""
+        return self._leaves(self._validate(X)).T
+
+    def _leaves(self, X) -> np.ndarray:
+        """Leaves as (n_estimators, n_samples): tree-major, so each tree's gathers stay together"""
+        n = len(X)
+        # Feature-major input: the value of feature f for sample i is at f * n + i
+        columns = np.ascontiguousarray(X.T).ravel()
+        samples = np.arange(n, dtype=np.intp)[np.newaxis, :]
+        children = self.children.ravel()
+        nodes = np.repeat(self.roots[:, np.newaxis], n, axis=1)
+        for _ in range(self.max_depth):
+            values = columns.take(self.feature.take(nodes) * n + samples)
+            go_right = values > self.threshold.take(nodes)
+            nodes = children.take(2 * nodes + go_right)
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaf_proba = self.proba[self._leaves(self._validate(X))]
+        # Summing over the leading (slow) axis adds the trees one after another,
+        # like sklearn's accumulation; NumPy only sums pairwise along the fast axis
+        proba = leaf_proba.sum(axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def _validate(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a 2-D array with {self.n_features_in_} features, got shape {X.shape}")
+        if not np.all(np.isfinite(X)):
+            raise ValueError("Input contains NaN, infinity or a value too large for dtype('float32').")
+        return X
+
+
+def compile_forest(rf, source_sha256=None) -> CompiledForest:
+    """Copy a fitted single-output RandomForestClassifier into flat node arrays"""
+    if getattr(rf, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be compiled")
+
+    roots, feature, threshold, children, proba = [], [], [], [], []
+    offset = 0
+    for estimator in rf.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        left = np.where(leaf, np.arange(n), tree.children_left) + offset
+        right = np.where(leaf, np.arange(n), tree.children_right) + offset
+        # Same normalization as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :rf.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+
+        roots.append(offset)
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, 0.0, tree.threshold))
+        children.append(np.stack([left, right], axis=1))
+        proba.append(value / normalizer)
+        offset += n
+
+    arrays = {
+        "roots": np.array(roots),
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "children": np.concatenate(children),
+        "proba": np.concatenate(proba),
+    }
+    arrays = {name: np.ascontiguousarray(values, dtype=ARRAY_DTYPES[name]) for name, values in arrays.items()}
+    max_depth = max(estimator.tree_.max_depth for estimator in rf.estimators_)
+    return CompiledForest(arrays, rf.classes_, rf.n_features_in_, max_depth, source_sha256)
+
+
+# ========================
+# File format
+# ========================
+# MAGIC, u64 header length, JSON header, then each array at an ALIGN-ed offset
+def save_forest(forest: CompiledForest, path: str):
+    arrays = forest.arrays
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        layout[name] = {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offset}
+        offset += -(-values.nbytes // ALIGN) * ALIGN
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "classes": forest.classes_.tolist(),
+        "n_features": forest.n_features_in_,
+        "max_depth": forest.max_depth,
+        "source_sha256": forest.source_sha256,
+        "arrays": layout
+    }).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, values in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def load_forest(path: str, mmap=True) -> CompiledForest:
+    """Open a .forest file; with mmap the node arrays are read-only views of the file"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a compiled forest")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"{path} has format version {header['version']}, expected {FORMAT_VERSION}")
+    data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        if mmap:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + spec["offset"], shape=shape)
+        else:
+            arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=data_start + spec["offset"]).reshape(shape)
+    return CompiledForest(arrays, header["classes"], header["n_features"], header["max_depth"], header["source_sha256"])
+
+
+def compiled_path(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + ".forest"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_compiled(source_path: str) -> CompiledForest:
+    """
+    The compiled form of a pickled forest
+
+    Uses its .forest file when that was compiled from this exact pickle (or the
+    pickle is not deployed); otherwise compiles the pickle in memory.
+    """
+    import joblib
+
+    path = compiled_path(source_path)
+    if not os.path.exists(source_path):
+        return load_forest(path)
+    digest = file_sha256(source_path)
+    if os.path.exists(path):
+        forest = load_forest(path)
+        if forest.source_sha256 == digest:
+            return forest
+        print(f"📌 Note: {path} was compiled from another model - run forest_compiler.py again")
+    return compile_forest(joblib.load(source_path), source_sha256=digest)
+
+
+# ========================
+# CLI
+# ========================
+def check(rf, forest, n_samples=20000) -> int:
+    """Rows of random inputs (at the scale of scaled features) where the two disagree"""
+    rng = np.random.default_rng(0)
+    mismatches = 0
+    for batch_size in (1, 7, 256, n_samples):
+        X = rng.normal(0, 2, (batch_size, forest.n_features_in_))
+        mismatches += int(np.any(forest.predict_proba(X) != rf.predict_proba(X), axis=1).sum())
+    return mismatches
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default=os.path.join("models", "railway_anomaly_detector.pkl"),
+                        help="pickled RandomForestClassifier")
+    parser.add_argument("--output", help="compiled file (default: the model path with .forest)")
+    parser.add_argument("--check", action="store_true", help="compare the compiled forest against predict_proba")
+    args = parser.parse_args()
+
+    rf = joblib.load(args.model)
+    path = args.output or compiled_path(args.model)
+    save_forest(compile_forest(rf, source_sha256=file_sha256(args.model)), path)
+    forest = load_forest(path)
+    print(f"✓ Wrote {path} ({os.path.getsize(path) / 1e3:.0f} kB, {forest.n_estimators} trees, "
+          f"{len(forest.feature)} nodes, depth {forest.max_depth})")
+
+    ok = True
+    if args.check:
+        mismatches = check(rf, forest)
+        ok = mismatches == 0
+        print(f"  {'✓' if ok else '❌'} {mismatches} rows differ from predict_proba")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+fusion.py
+Weighted fusion of the modality scores, and the range it can still reach.
+Every score lies in [0, 1] and the intent score is a fixed weighted sum of
+them, so with only some modalities scored, the lowest and highest reachable
+intent are known. In "cascade" mode /predict/intent scores the modalities
+cheapest first and skips the rest as soon as both bounds land in the same
+risk band: no score the skipped models could return would change the alert.
+"""
+
+FUSION_MODES = ("exact", "cascade")
+
+# Summed in this order, so a full fusion matches the original expression bit for bit
+WEIGHTS = {
+    "vibration": 0.35,
+    "acoustic": 0.30,
+    "human": 0.20,
+    "temporal": 0.10,
+    "context": 0.05,
+}
+ALERT_THRESHOLD = 0.5
+HIGH_RISK_THRESHOLD = 0.75
+# Bounds must clear a threshold by this much, so float rounding never flips a band
+BAND_MARGIN = 1e-9
+
+
+def weighted_sum(scores: dict) -> float:
+    """Intent over the scored modalities (missing or None ones count as 0)"""
+    intent = 0.0
+    for name, weight in WEIGHTS.items():
+        score = scores.get(name)
+        if score is not None:
+            intent += weight * score
+    return intent
+
+
+def intent_bounds(scores: dict, ranges=None) -> tuple:
+    """
+    (lowest, highest) intent reachable given the known scores
+
+    Args:
+        scores: {modality: score}; missing or None modalities may be anywhere in [0, 1]
+        ranges: {modality: (low, high)} narrower ranges for unscored modalities
+            (e.g. the human score is at least the PIR state)
+    """
+    ranges = ranges or {}
+    low = high = 0.0
+    for name, weight in WEIGHTS.items():
+        score = scores.get(name)
+        lo, hi = (score, score) if score is not None else ranges.get(name, (0.0, 1.0))
+        low += weight * lo
+        high += weight * hi
+    return low, high
+
+
+def risk_band(intent: float):
+    """Alert risk of an intent score: None (no alert), medium or high"""
+    if intent > HIGH_RISK_THRESHOLD:
+        return "high"
+    if intent > ALERT_THRESHOLD:
+        return "medium"
+    return None
+
+
+def band_decided(low: float, high: float) -> bool:
+    """True once every intent in [low, high] falls in the same risk band"""
+    return risk_band(low - BAND_MARGIN) == risk_band(high + BAND_MARGIN)
@@ -0,0 +1,107 @@
+"""
+inference_backends.py
+Runtimes for the acoustic CNN and the LSTM.
+The Keras models can be served as-is, or from TFLite / ONNX exports
+(see convert_models.py), which skip Keras' predict() machinery and run a
+single forward pass per micro-batch with much less per-call overhead.
+All backends expose the same predict(x) -> np.ndarray interface.
+"""
+
+import threading
+
+import numpy as np
+
+BACKENDS = ("keras", "tflite", "onnx")
+EXTENSIONS = {"tflite": ".tflite", "onnx": ".onnx"}
+
+
+class KerasBackend:
+    """The rebuilt Keras model, called through model.predict()"""
+
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self.model.predict(x, batch_size=len(x), verbose=0)
+
+
+def _tflite_interpreter(path, default_delegates=True):
+    # Prefer the standalone runtimes so a TFLite deployment does not need the
+    # full TensorFlow package; fall back to the interpreter bundled with it
+    try:
+        from ai_edge_litert import interpreter as runtime
+    except ImportError:
+        try:
+            from tflite_runtime import interpreter as runtime
+        except ImportError:
+            import tensorflow as tf
+            runtime = tf.lite
+    kwargs = {}
+    if not default_delegates:
+        resolver = getattr(runtime, "OpResolverType", None) or runtime.experimental.OpResolverType
+        kwargs["experimental_op_resolver_type"] = resolver.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    return runtime.Interpreter(model_path=path, **kwargs)
+
+
+class TFLiteBackend:
+    """
+    A .tflite model exported with a dynamic batch dimension
+
+    The input tensor is resized whenever the batch size changes; the
+    micro-batcher pads to powers of two, so that happens rarely.
+
+    The model file is memory-mapped. With default_delegates=False the
+    builtin kernels read the weights in place from that mapping, so
+    processes opening the same file share them; the default XNNPACK
+    delegate is faster but repacks the weights into each process's heap.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path: str, default_delegates=True):
+        self.path = path
+        self.interpreter = _tflite_interpreter(path, default_delegates)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]["index"]
+        self._output = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        with self._lock:
+            if len(x) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input, list(x.shape))
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(x)
+            self.interpreter.set_tensor(self._input, x)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output).copy()
+
+
+class OnnxBackend:
+    """An .onnx model run with onnxruntime on the CPU"""
+
+    name = "onnx"
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+
+        self.path = path
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return self.session.run(None, {self._input: x})[0]
+
+
+def load_exported(backend: str, path: str, share_weights=False):
+    """Open an exported model with the named runtime (share_weights: keep TFLite weights in the shared file mapping)"""
+    if backend == "tflite":
+        return TFLiteBackend(path, default_delegates=not share_weights)
+    if backend == "onnx":
+        return OnnxBackend(path)
+    raise ValueError(f"Unsupported inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
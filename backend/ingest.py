@@ -0,0 +1,95 @@
+"""
+ingest.py
+Decoding of vibration / sequence payloads into NumPy arrays.
+Besides the original comma separated text, clients can send raw little-endian
+float32/float64 bytes, base64 text of those bytes, or .npy files. Binary
+payloads are wrapped with np.frombuffer, so no per-sample Python objects are
+created.
+"""
+
+import base64
+import binascii
+import io
+
+import numpy as np
+
+NPY_MAGIC = b"\x93NUMPY"
+ENCODINGS = ("csv", "base64")
+DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+}
+
+
+def parse_csv(text: str) -> np.ndarray:
+    """
+    Parse comma separated floats
+
+    NumPy converts the tokens in one C loop with the same rules as float(), so
+    malformed input ("3abc", empty fields) is rejected like the old float() loop did,
+    naming the first token that does not parse.
+    """
+    tokens = text.strip().split(",")
+    try:
+        return np.array(tokens, dtype=np.float64)
+    except ValueError as e:
+        # Only on failure: find the offending token for the error message
+        for i, token in enumerate(tokens):
+            try:
+                float(token)
+            except ValueError:
+                raise ValueError(f"could not convert string to float: {token[:40]!r} (value {i + 1})") from e
+        raise
+
+
+def decode_binary(data: bytes, dtype: str = "float32") -> np.ndarray:
+    """
+    Zero-copy view of a binary payload: a .npy file (detected by its magic
+    bytes) or raw little-endian samples of the given dtype
+    """
+    if data[:len(NPY_MAGIC)] == NPY_MAGIC:
+        return decode_npy(data)
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {', '.join(DTYPES)}")
+    itemsize = DTYPES[dtype].itemsize
+    if len(data) == 0 or len(data) % itemsize:
+        raise ValueError(f"Binary payload of {len(data)} bytes is not a whole number of {dtype} samples")
+    return np.frombuffer(data, dtype=DTYPES[dtype])
+
+
+def decode_npy(data: bytes) -> np.ndarray:
+    """Read a .npy header and return a view on its data without copying it"""
+    with io.BytesIO(data) as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if dtype.kind not in "fiu":
+        raise ValueError(f"Unsupported .npy dtype {dtype}")
+    count = int(np.prod(shape))
+    if len(data) - offset < count * dtype.itemsize:
+        raise ValueError(".npy payload is truncated")
+    if sum(dim > 1 for dim in shape) > 1:
+        raise ValueError(f"Expected a 1-D array, got shape {shape}")
+    return np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+
+
+def decode_base64(text: str, dtype: str = "float32") -> np.ndarray:
+    """Base64 text of a raw or .npy binary payload"""
+    try:
+        data = base64.b64decode(text.strip(), validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 payload: {e}")
+    return decode_binary(data, dtype)
+
+
+def decode_text(text: str, encoding: str = "csv", dtype: str = "float32"):
+    """Decode a form/JSON text field according to its declared encoding"""
+    if encoding == "csv":
+        return parse_csv(text)
+    if encoding == "base64":
+        return decode_base64(text, dtype)
+    raise ValueError(f"Unsupported encoding '{encoding}', expected one of {', '.join(ENCODINGS)}")
@@ -0,0 +1,362 @@
+"""
+loadtest.py
+Throughput and latency benchmark for /predict/intent.
+
+Builds a corpus with the demo data generators from test.py, then drives the
+API at one or more concurrency levels, either in-process through an ASGI
+transport (no network, no separate server) or over real HTTP. Reports
+p50/p95/p99 latency, requests per second, the per-stage `timing_ms`
+breakdown returned by the API and peak RSS as JSON, so runs from two
+releases can be diffed. The server's RSS before the run is reported too, so
+large uploads (--audio-sample-rate 48000 --audio-seconds 10 --audio-channels 2)
+show how much memory each in-flight request costs.
+
+The numbers measure inference, not the score cache: in --mode asgi the cache
+is switched off, and in --mode http (where the server's cache cannot be
+changed) every request is made unique by nudging its last vibration and
+sequence values and two audio sample LSBs. The report's score_cache section
+shows the server-side hits during the run; pass --cache to measure with the
+cache instead.
+
+Usage:
+    python loadtest.py --mode asgi --concurrency 1 8 32 --requests 200
+    python loadtest.py --mode http --url http://localhost:8000 --server-pid 1234 -o bench.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import soundfile as sf
+
+import test as demo
+
+CASES = [
+    # (vibration file, sequence file, audio file, pir)
+    ("vibration_data_1.txt", "sequence_data_1.txt", "audio_high_risk.wav", 1),
+    ("vibration_data_2.txt", "sequence_data_2.txt", "audio_medium_risk.wav", 1),
+    ("vibration_data_3.txt", "sequence_data_3.txt", "audio_low_risk.wav", 0),
+]
+
+
+# ========================
+# Corpus
+# ========================
+def build_corpus(directory: str, size: int, seed: int = 0,
+                 audio_sample_rate: int = 16000, audio_seconds: float = 5, audio_channels: int = 1) -> list:
+    """
+    `size` distinct request payloads derived from test.py's demo data
+
+    The generators are seeded, so every variant after the first three gets its
+    own small perturbation (and freshly generated audio); otherwise the score
+    cache would answer most of the run.
+    """
+    demo.DEMO_DATA_DIR = directory
+    os.makedirs(directory, exist_ok=True)
+    demo.generate_vibration_data()
+    demo.generate_sequence_data()
+
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(size):
+        vib_file, seq_file, audio_file, pir = CASES[i % len(CASES)]
+        vibration = np.loadtxt(os.path.join(directory, vib_file), delimiter=",")
+        sequence = np.loadtxt(os.path.join(directory, seq_file), delimiter=",")
+        anomaly = audio_file != "audio_low_risk.wav"
+        np.random.seed(seed + i)
+        audio_path = demo.generate_demo_audio(f"loadtest_{i}.wav", duration=audio_seconds,
+                                              sample_rate=audio_sample_rate, anomaly=anomaly)
+        if audio_channels > 1:
+            mono, sr = sf.read(audio_path)
+            channels = [mono] + [0.9 * mono + rng.normal(0, 0.01, len(mono)) for _ in range(audio_channels - 1)]
+            sf.write(audio_path, np.clip(np.stack(channels, axis=1), -1, 1), sr, subtype="PCM_16")
+        if i >= len(CASES):
+            vibration = vibration + rng.normal(0, 0.005, len(vibration))
+            sequence = sequence + rng.normal(0, 0.005, len(sequence))
+        with open(audio_path, "rb") as f:
+            audio = f.read()
+        corpus.append({
+            "last_values": (float(vibration[-1]), float(sequence[-1])),
+            "data": {
+                "vibration": ",".join(f"{x:.6f}" for x in vibration),
+                "sequence": ",".join(f"{x:.6f}" for x in sequence),
+                "pir": pir,
+                "weather_ignore": False
+            },
+            "audio": audio
+        })
+    return corpus
+
+
+def unique_payload(payload: dict, n: int) -> dict:
+    """
+    The payload with a per-request twist, so the server's score cache never
+    answers it: the last vibration and sequence values move by n * 1e-9 and n
+    is XORed into the low bytes of the clip's last three 16-bit samples
+    """
+    data = dict(payload["data"])
+    last_vibration, last_sequence = payload["last_values"]
+    for name, last in (("vibration", last_vibration), ("sequence", last_sequence)):
+        head = data[name].rsplit(",", 1)[0]
+        data[name] = f"{head},{last + n * 1e-9:.9f}"
+    audio = bytearray(payload["audio"])
+    for i, shift in ((-2, 0), (-4, 8), (-6, 16)):
+        audio[i] ^= (n >> shift) & 0xFF
+    return {"data": data, "audio": bytes(audio)}
+
+
+# ========================
+# Runner
+# ========================
+async def wait_ready(client, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready in time")
+
+
+async def post_intent(client, payload):
+    start = time.perf_counter()
+    response = await client.post(
+        "/predict/intent",
+        data=payload["data"],
+        files={"acoustic_file": ("clip.wav", payload["audio"], "audio/wav")}
+    )
+    latency = (time.perf_counter() - start) * 1000
+    stages = response.json().get("timing_ms", {}) if response.status_code == 200 else {}
+    return latency, response.status_code, stages
+
+
+async def run_level(client, corpus, concurrency, total, unique=None):
+    """
+    `total` requests with `concurrency` of them in flight at any time
+
+    With `unique` (a shared counter), every payload is made distinct with unique_payload()
+    """
+    results = []
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            payload = corpus[next_index % len(corpus)]
+            next_index += 1
+            if unique is not None:
+                payload = unique_payload(payload, next(unique))
+            try:
+                results.append(await post_intent(client, payload))
+            except httpx.HTTPError as e:
+                results.append((None, type(e).__name__, {}))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return summarize(results, concurrency, elapsed)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(values.mean()), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+
+def summarize(results, concurrency, elapsed):
+    ok = [r for r in results if r[1] == 200]
+    stage_names = sorted({name for _, _, stages in ok for name in stages})
+    errors = {}
+    for _, status, _ in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_ms": percentiles([latency for latency, _, _ in ok]),
+        "stages_ms": {
+            name: percentiles([stages[name] for _, _, stages in ok if name in stages])
+            for name in stage_names
+        }
+    }
+
+
+# ========================
+# Report
+# ========================
+def peak_rss_mb(pid=None):
+    """Peak resident set size of this process, or of `pid` (Linux /proc)"""
+    if pid is None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb(pid=None):
+    """Resident set size right now of this process, or of `pid` (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def cache_hits(stats: dict) -> int:
+    """Score cache hits over all modalities in a /cache/stats response"""
+    return sum(m.get("hits", 0) for m in stats.get("modalities", {}).values())
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory(prefix="guardrail-loadtest-") as directory:
+        corpus = build_corpus(directory, args.corpus_size, args.seed,
+                              args.audio_sample_rate, args.audio_seconds, args.audio_channels)
+
+    # Over HTTP the server's cache setting is out of reach, so payloads are made unique instead
+    unique = itertools.count(1) if args.mode == "http" and not args.cache else None
+    if args.mode == "asgi":
+        if not args.cache:
+            os.environ.setdefault("GUARDRAIL_SCORE_CACHE_SIZE", "0")
+        import main
+        lifespan = main.app.router.lifespan_context(main.app)
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = "http://loadtest"
+    else:
+        lifespan = None
+        transport = None
+        base_url = args.url
+
+    levels = []
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client)
+            if args.mode == "asgi":
+                rss_before = current_rss_mb()
+            else:
+                rss_before = current_rss_mb(args.server_pid) if args.server_pid else None
+            cache_before = (await client.get("/cache/stats")).json()
+            if args.warmup:
+                await run_level(client, corpus, min(args.warmup, max(args.concurrency)), args.warmup, unique)
+            for concurrency in args.concurrency:
+                level = await run_level(client, corpus, concurrency, args.requests, unique)
+                levels.append(level)
+                latency = level["latency_ms"] or {}
+                print(f"  c={concurrency:<4} {level['rps']} req/s  p50 {latency.get('p50')} ms  "
+                      f"p99 {latency.get('p99')} ms  errors {sum(level['errors'].values())}", file=sys.stderr)
+            health = (await client.get("/health")).json()
+            cache_after = (await client.get("/cache/stats")).json()
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": git_revision(),
+            "mode": args.mode,
+            "url": args.url if args.mode == "http" else None,
+            "requests_per_level": args.requests,
+            "warmup": args.warmup,
+            "corpus_size": args.corpus_size,
+            "audio": {
+                "sample_rate": args.audio_sample_rate,
+                "seconds": args.audio_seconds,
+                "channels": args.audio_channels,
+                "mean_bytes": int(np.mean([len(p["audio"]) for p in corpus]))
+            },
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "env": {k: v for k, v in os.environ.items() if k.startswith("GUARDRAIL_")},
+            "models": health.get("models")
+        },
+        "score_cache": {
+            "enabled": cache_after.get("enabled"),
+            "unique_payloads": unique is not None,
+            "hits": cache_hits(cache_after) - cache_hits(cache_before)
+        },
+        "levels": levels,
+        "rss_before_mb": {"server": rss_before},
+        "peak_rss_mb": {
+            "client": peak_rss_mb() if args.mode == "http" else None,
+            "server": peak_rss_mb() if args.mode == "asgi" else peak_rss_mb(args.server_pid)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /predict/intent")
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi",
+                        help="asgi: run the app in this process; http: hit a running server")
+    parser.add_argument("--url", default=demo.API_URL, help="server URL for --mode http")
+    parser.add_argument("--server-pid", type=int, help="server PID, to report its peak RSS in --mode http")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests before the first level")
+    parser.add_argument("--corpus-size", type=int, default=32, help="distinct payloads to cycle through")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--audio-sample-rate", type=int, default=16000, help="sample rate of the generated clips")
+    parser.add_argument("--audio-seconds", type=float, default=5, help="length of the generated clips")
+    parser.add_argument("--audio-channels", type=int, default=1, help="channels of the generated clips")
+    parser.add_argument("--cache", action="store_true",
+                        help="measure with the score cache: keep it on in --mode asgi, and send the corpus "
+                             "payloads as-is in --mode http (by default every request is scored)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"✓ Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -273,24 +273,91 @@ import numpy as np
 
 # CRITICAL: Import and register VibrationFeatureExtractor in __main__ namespace
 # This fixes pickle loading issue where class was saved from __main__
-from vibration_features import VibrationFeatureExtractor
+from vibration_features import VibrationFeatureExtractor, VibrationPipeline
 sys.modules['__main__'].VibrationFeatureExtractor = VibrationFeatureExtractor
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-import tensorflow as tf
-from tensorflow import keras
-import librosa
-import soundfile as sf
-import io
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
+import os
+import json
 import joblib
-from typing import Optional
+import math
+import asyncio
+import contextvars
+import functools
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import List, Optional
 import uvicorn
-import h5py
+
+# TensorFlow is imported where first needed (model build): it takes several
+# seconds to import, and a vibration-only deployment never needs it. The mel
+# front end (spectrogram.py) does not use librosa at all.
+
+from config import settings
+from batching import MicroBatcher
+from ingest import decode_binary, decode_text, parse_csv
+from model_registry import ModelRegistry, ModelNotReady
+from inference_backends import BACKENDS, EXTENSIONS, KerasBackend, load_exported
+from spectrogram import MelFrontend, decode_audio
+from score_cache import ScoreCache
+from streaming import SensorStream
+from sequence_buffers import SequenceBufferStore
+from sensor_archive import ArchiveWriter, SensorArchive, check_sensor_id
+from fanin import MODALITIES, FanInAggregator
+from forest_compiler import load_compiled
+import shared_weights
+from fusion import FUSION_MODES, band_decided, intent_bounds, risk_band, weighted_sum
+from uploads import PayloadTooLarge, UploadLimitMiddleware, check_size, check_upload
+from vision import PendingUpdates, VisionStage, load_yolo
+import metrics
+from metrics import stage
+
+# Scorers block on NumPy / scikit-learn / TensorFlow, all of which release the GIL,
+# so a bounded thread pool lets the modalities of one request run side by side
+# while the event loop keeps serving other connections (e.g. /health).
+def make_scorer_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=settings.scorer_pool_size, thread_name_prefix="scorer")
+
+scorer_pool = make_scorer_pool()
+# Set when a lifespan shut the workers down: the next startup in this process
+# (a reused TestClient, an in-process reload) creates fresh ones
+workers_closed = False
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global scorer_pool, acoustic_batcher, lstm_batcher, vision_stage, archive_writer, workers_closed
+    if workers_closed:
+        scorer_pool = make_scorer_pool()
+        acoustic_batcher, lstm_batcher, vision_stage = make_batchers()
+        archive_writer = make_archive_writer()
+        workers_closed = False
+    # Load in the background so uvicorn accepts connections (and /health) immediately;
+    # /ready reports when the models are usable
+    if settings.preload_models:
+        registry.load_all_in_background()
+    sweeper = asyncio.create_task(sweep_fanin())
+    yield
+    sweeper.cancel()
+    acoustic_batcher.close()
+    lstm_batcher.close()
+    if vision_stage is not None:
+        vision_stage.close()
+    if archive_writer is not None:
+        archive_writer.close()
+    scorer_pool.shutdown(wait=False, cancel_futures=True)
+    workers_closed = True
 
 app = FastAPI(
     title="Railway Track Intrusion Detection API",
     description="Fuses vibration, acoustic, sequence, human detection → computes intent score & alert",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ========================
@@ -298,6 +365,7 @@ app = FastAPI(
 # ========================
 def build_acoustic_model():
     """Rebuild acoustic CNN architecture - matches voice-model notebook"""
+    from tensorflow import keras
     model = keras.Sequential([
         keras.layers.Conv2D(32, (3, 3), activation='relu', input_shape=(64, 128, 1)),
         keras.layers.MaxPooling2D((2, 2)),
@@ -312,57 +380,162 @@ def build_acoustic_model():
     ])
     return model
 
-def build_lstm_model():
-    """Rebuild LSTM sequence predictor - matches lstm-seq-final notebook"""
+def build_lstm_model(unroll=False):
+    """
+    Rebuild LSTM sequence predictor - matches lstm-seq-final notebook
+
+    unroll=True gives the same network without the symbolic time loop, which
+    is what the TFLite export needs (weights are interchangeable).
+    """
+    from tensorflow import keras
     model = keras.Sequential([
-        keras.layers.LSTM(128, return_sequences=True, input_shape=(60, 1)),
+        keras.layers.LSTM(128, return_sequences=True, unroll=unroll, input_shape=(60, 1)),
         keras.layers.Dropout(0.2),
-        keras.layers.LSTM(64),
+        keras.layers.LSTM(64, unroll=unroll),
         keras.layers.Dropout(0.2),
         keras.layers.Dense(1)
     ])
     return model
 
 # ========================
-# Load All Models
+# Model Loading
 # ========================
-print("Loading models...")
+def model_path(filename: str) -> str:
+    return os.path.join(settings.models_dir, filename)
+
+def load_vibration_models():
+    """Vibration: Random Forest + Scaler + Feature Extractor, fused into one pipeline"""
+    if settings.shared_weights_dir:
+        rf_model, vib_scaler, feature_extractor = shared_weights.load_vibration(settings.shared_weights_dir)
+        models = SimpleNamespace(rf_model=rf_model, vib_scaler=vib_scaler, feature_extractor=feature_extractor)
+    else:
+        rf_path = model_path("railway_anomaly_detector.pkl")
+        models = SimpleNamespace(
+            rf_model=load_compiled(rf_path) if settings.compiled_forest else joblib.load(rf_path),
+            vib_scaler=joblib.load(model_path("scaler.pkl")),
+            feature_extractor=joblib.load(model_path("feature_extractor.pkl"))
+        )
+    models.pipeline = VibrationPipeline(models.feature_extractor, models.vib_scaler, models.rf_model)
+    print(f"✓ Loaded vibration models{' (shared)' if settings.shared_weights_dir else ''}")
+    return models
+
+def load_exported_model(stem: str, input_shape):
+    """Open models/<stem>.tflite or .onnx (written by convert_models.py)"""
+    if settings.inference_backend not in EXTENSIONS:
+        raise ValueError(f"Unsupported inference backend '{settings.inference_backend}', expected one of {', '.join(BACKENDS)}")
+    filename = stem + EXTENSIONS[settings.inference_backend]
+    # A prepared shared directory holds the TFLite exports every worker maps
+    shared = settings.shared_weights_dir and shared_weights.shared_file(settings.shared_weights_dir, filename)
+    path = shared or model_path(filename)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found - run convert_models.py to export it")
+    model = load_exported(settings.inference_backend, path, share_weights=bool(shared))
+    model.predict(np.zeros((1,) + input_shape, dtype=np.float32))
+    return model
 
-try:
-    # 1. Vibration: Random Forest + Scaler + Feature Extractor
-    rf_model = joblib.load("./models/railway_anomaly_detector.pkl")
-    vib_scaler = joblib.load("./models/scaler.pkl")
-    feature_extractor = joblib.load("./models/feature_extractor.pkl")
-    print("✓ Loaded vibration models")
+def load_acoustic_model():
+    """Acoustic: CNN - Rebuild architecture and load weights (or open its export)"""
+    if settings.inference_backend != "keras":
+        model = load_exported_model("acoustic_tool_detector", (64, 128, 1))
+        print(f"✓ Loaded acoustic model ({settings.inference_backend})")
+        return model
+    acoustic_model = build_acoustic_model()
+    acoustic_model.load_weights(model_path("acoustic_tool_detector.h5"))
+    acoustic_model.compile(optimizer='adam', loss='binary_crossentropy')
+    # Build the predict function once here so concurrent first requests don't race to trace it
+    acoustic_model.predict(np.zeros((1, 64, 128, 1)), verbose=0)
+    print("✓ Loaded acoustic model (rebuilt + weights)")
+    return KerasBackend(acoustic_model)
+
+def load_lstm_model():
+    """Sequence: LSTM - Rebuild architecture and load weights (or open its export)"""
+    if settings.inference_backend != "keras":
+        model = load_exported_model("lstm_sequence_predictor", (60, 1))
+        print(f"✓ Loaded LSTM model ({settings.inference_backend})")
+        return model
+    lstm_model = build_lstm_model()
+    lstm_model.load_weights(model_path("lstm_sequence_predictor.h5"))
+    lstm_model.compile(optimizer='adam', loss='mse')
+    lstm_model.predict(np.zeros((1, 60, 1)), verbose=0)
+    print("✓ Loaded LSTM model (rebuilt + weights)")
+    return KerasBackend(lstm_model)
+
+def load_vision_model():
+    """Human: YOLO person detector (ultralytics, imported only when vision is enabled)"""
+    detector = load_yolo(model_path(settings.vision_model), settings.vision_image_size, settings.vision_confidence)
+    print(f"✓ Loaded YOLO model ({settings.vision_model})")
+    return detector
+
+if settings.fusion_mode not in FUSION_MODES:
+    raise ValueError(f"Unsupported fusion mode '{settings.fusion_mode}', expected one of {', '.join(FUSION_MODES)}")
+
+enabled_models = {name.strip() for name in settings.enabled_models.split(",")}
+registry = ModelRegistry()
+registry.register("vibration", load_vibration_models, enabled="vibration" in enabled_models)
+registry.register("acoustic", load_acoustic_model, enabled="acoustic" in enabled_models)
+registry.register("lstm", load_lstm_model, enabled="lstm" in enabled_models)
+registry.register("vision", load_vision_model, enabled="vision" in enabled_models)
+
+# Scores of recently seen payloads, keyed by a hash of the raw input
+score_cache = ScoreCache(
+    max_entries=settings.score_cache_size,
+    ttl_seconds=settings.score_cache_ttl_seconds
+)
+# Score cache modality of each model (person detections are not cached)
+CACHED_MODALITIES = {"vibration": "vibration", "acoustic": "acoustic", "lstm": "temporal"}
 
-    # 2. Acoustic: CNN - Rebuild architecture and load weights
-    try:
-        acoustic_model = build_acoustic_model()
-        acoustic_model.load_weights("./models/acoustic_tool_detector.h5")
-        acoustic_model.compile(optimizer='adam', loss='binary_crossentropy')
-        print("✓ Loaded acoustic model (rebuilt + weights)")
-    except Exception as e:
-        print(f"Acoustic model loading failed: {e}")
-        raise
+print(f"Models enabled: {', '.join(sorted(enabled_models))} (inference backend: {settings.inference_backend})")
+if settings.shared_weights_dir and settings.inference_backend == "keras" and enabled_models & {"acoustic", "lstm"}:
+    print("📌 Note: Keras CNN/LSTM weights load per worker - use the tflite backend to map them from the shared directory")
+if "vision" not in enabled_models:
+    print("📌 Note: YOLO disabled - using PIR-only for human detection")
 
-    # 3. Sequence: LSTM - Rebuild architecture and load weights
-    try:
-        lstm_model = build_lstm_model()
-        lstm_model.load_weights("./models/lstm_sequence_predictor.h5")
-        lstm_model.compile(optimizer='adam', loss='mse')
-        print("✓ Loaded LSTM model (rebuilt + weights)")
-    except Exception as e:
-        print(f"LSTM model loading failed: {e}")
-        raise
+def timed_predict(name: str, x: np.ndarray) -> np.ndarray:
+    """One micro-batch forward pass, recorded in the inference time / batch size histograms"""
+    model = registry.get(name)
+    start = time.perf_counter()
+    outputs = model.predict(x)
+    metrics.INFERENCE_SECONDS.observe(time.perf_counter() - start, model=name)
+    metrics.BATCH_SIZE.observe(len(x), model=name)
+    return outputs
 
-    print("\n✅ All models loaded successfully!")
-    print("📌 Note: YOLO disabled - using PIR-only for human detection")
-    
-except Exception as e:
-    print(f"\n❌ Model loading failed: {str(e)}")
-    import traceback
-    traceback.print_exc()
-    raise
+def make_batchers() -> tuple:
+    """
+    Micro-batchers, so concurrent requests share one forward pass:
+    (acoustic, lstm, vision stage or None)
+
+    Person detection gets its own decode/letterbox threads and micro-batcher,
+    so slow images never hold up the scorer pool.
+    """
+    acoustic = MicroBatcher(
+        lambda x: timed_predict("acoustic", x),
+        max_batch_size=settings.batch_max_size,
+        max_wait_ms=settings.batch_max_wait_ms,
+        name="acoustic-batcher"
+    )
+    lstm = MicroBatcher(
+        lambda x: timed_predict("lstm", x),
+        max_batch_size=settings.batch_max_size,
+        max_wait_ms=settings.batch_max_wait_ms,
+        name="lstm-batcher"
+    )
+    vision = None
+    if "vision" in enabled_models:
+        vision = VisionStage(
+            MicroBatcher(
+                lambda x: timed_predict("vision", x),
+                max_batch_size=settings.vision_batch_max_size,
+                max_wait_ms=settings.vision_batch_max_wait_ms,
+                name="vision-batcher"
+            ),
+            image_size=settings.vision_image_size,
+            pool_size=settings.vision_pool_size
+        )
+    return acoustic, lstm, vision
+
+acoustic_batcher, lstm_batcher, vision_stage = make_batchers()
+# Final results of responses sent before their vision result was in
+pending_updates = PendingUpdates()
 
 # ========================
 # Constants
@@ -377,139 +550,1071 @@ INTENT_THRESHOLD = 0.55
 # Helper Functions
 # ========================
 
-def extract_mel(audio_bytes: bytes) -> np.ndarray:
+# Same mel pipeline as training (librosa melspectrogram + power_to_db(ref=np.max)),
+# with the filterbank, window and resamplers built once
+mel_frontend = MelFrontend(
+    sr=TARGET_SR, n_fft=1024, hop_length=512, n_mels=MEL_SHAPE[0], n_frames=MEL_SHAPE[1],
+    ref_scope=settings.mel_ref_scope
+)
+
+# Latest LSTM window per track segment, for clients that only send new samples
+sequence_buffers = SequenceBufferStore(
+    window=LSTM_WINDOW,
+    max_segments=settings.sequence_buffer_max_segments,
+    ttl_seconds=settings.sequence_buffer_ttl_seconds
+)
+
+# Per-segment time alignment of modality readings posted one by one (/fanin/events)
+fanin = FanInAggregator(
+    window_seconds=settings.fanin_window_seconds,
+    deadline_seconds=settings.fanin_deadline_seconds,
+    required=[m.strip() for m in settings.fanin_required_modalities.split(",") if m.strip()],
+    max_segments=settings.fanin_max_segments,
+    max_open_windows=settings.fanin_max_open_windows
+)
+# How often open fan-in windows are checked against their deadline
+FANIN_SWEEP_SECONDS = 0.1
+
+# Scored records and their raw inputs, for replay and re-scoring (rescore.py)
+def make_archive_writer():
+    if not settings.archive_dir:
+        return None
+    writer = ArchiveWriter(
+        SensorArchive(settings.archive_dir, audio_sample_rate=TARGET_SR),
+        max_pending=settings.archive_max_pending
+    )
+    print(f"✓ Archiving scored records to {settings.archive_dir}")
+    return writer
+
+archive_writer = make_archive_writer()
+
+def load_audio(source) -> np.ndarray:
+    """Decode (bytes or a binary file such as a spooled upload) and resample an audio chunk to TARGET_SR"""
     try:
-        with io.BytesIO(audio_bytes) as f:
-            audio, sr = sf.read(f)
-        if audio.ndim > 1:
-            audio = np.mean(audio, axis=1)
-        if sr != TARGET_SR:
-            audio = librosa.resample(audio, orig_sr=sr, target_sr=TARGET_SR)
-        mel = librosa.feature.melspectrogram(
-            y=audio, sr=TARGET_SR, n_mels=64, n_fft=1024, hop_length=512
-        )
-        mel_db = librosa.power_to_db(mel, ref=np.max)
-        if mel_db.shape[1] < MEL_SHAPE[1]:
-            mel_db = np.pad(mel_db, ((0, 0), (0, MEL_SHAPE[1] - mel_db.shape[1])))
-        else:
-            mel_db = mel_db[:, :MEL_SHAPE[1]]
-        return mel_db
+        with stage("audio_decode"):
+            audio, sr = mel_frontend.decode(source)
+        with stage("resample"):
+            return mel_frontend.conform(audio, sr)
     except Exception as e:
         raise ValueError(f"Audio processing failed: {str(e)}")
 
-def get_vibration_score(vibration_str: str) -> float:
+def extract_mel(source) -> np.ndarray:
+    audio = load_audio(source)
     try:
-        vib_array = np.array([float(x) for x in vibration_str.split(',')])
-        if len(vib_array) < 100:
-            raise ValueError("Vibration data too short")
-
-        features = feature_extractor.extract(vib_array)
-        if len(features) != VIB_FEATURE_COUNT:
-            raise ValueError(f"Expected {VIB_FEATURE_COUNT} features, got {len(features)}")
+        with stage("mel"):
+            return mel_frontend.transform([audio])[0]
+    except Exception as e:
+        raise ValueError(f"Audio processing failed: {str(e)}")
 
-        features_scaled = vib_scaler.transform([features])
-        prob = rf_model.predict_proba(features_scaled)[0][1]
-        return float(prob)
+def parse_values(values) -> np.ndarray:
+    """Accept comma separated text, a list of numbers (JSON records) or an already decoded array"""
+    if isinstance(values, str):
+        return parse_csv(values)
+    return np.asarray(values, dtype=float)
+
+def parse_vibration(vibration) -> np.ndarray:
+    vib_array = parse_values(vibration)
+    if vib_array.ndim != 1 or len(vib_array) < 100:
+        raise ValueError("Vibration data too short")
+    return vib_array
+
+def parse_sequence(sequence) -> np.ndarray:
+    seq = parse_values(sequence)
+    if seq.ndim != 1 or len(seq) != LSTM_WINDOW:
+        raise ValueError(f"Sequence must have {LSTM_WINDOW} values")
+    return seq
+
+def score_vibration_batch(vib_arrays: list) -> np.ndarray:
+    """Anomaly probability per vibration window: one scaler pass and one forest pass over an N x 20 matrix"""
+    vib = registry.get("vibration")
+    with stage("vibration_features"):
+        # Written into the scoring thread's preallocated feature buffer
+        features = vib.pipeline.extract(vib_arrays)
+    return score_vibration_features(features)
+
+def score_vibration_features(features: np.ndarray) -> np.ndarray:
+    """Anomaly probability per row of already extracted vibration features"""
+    vib = registry.get("vibration")
+    if features.shape[1] != VIB_FEATURE_COUNT:
+        raise ValueError(f"Expected {VIB_FEATURE_COUNT} features, got {features.shape[1]}")
+
+    with stage("scaler"):
+        features_scaled = vib.pipeline.scale_features(features)
+    with stage("rf"):
+        return vib.pipeline.classify(features_scaled)
+
+def score_acoustic_batch(mels: list) -> np.ndarray:
+    """Tool-sound probability per mel spectrogram; the micro-batcher packs them into shared forward passes"""
+    with stage("cnn"):
+        futures = [acoustic_batcher.submit(mel[..., np.newaxis]) for mel in mels]
+        return np.array([future.result()[0] for future in futures])
+
+def score_temporal_batch(seqs: list) -> np.ndarray:
+    """Unplanned-sequence probability per window, from the LSTM's error on the last value"""
+    with stage("lstm"):
+        futures = [lstm_batcher.submit(seq.reshape(LSTM_WINDOW, 1)) for seq in seqs]
+        preds = np.array([future.result()[0] for future in futures])
+    return unplanned_probability(preds, seqs)
+
+def unplanned_probability(preds: np.ndarray, seqs: list) -> np.ndarray:
+    """Sigmoid of the LSTM's absolute error on each window's last value"""
+    actual = np.array([seq[-1] for seq in seqs])
+    error = np.abs(preds - actual)
+    return 1 / (1 + np.exp(-(error - 0.05) / 0.02))
+
+def get_vibration_score(vibration) -> float:
+    return score_cache.get_or_compute("vibration", vibration, compute_vibration_score)
+
+def get_acoustic_score(audio) -> float:
+    return score_cache.get_or_compute("acoustic", audio, compute_acoustic_score)
+
+def get_temporal_score(sequence) -> float:
+    return score_cache.get_or_compute("temporal", sequence, compute_temporal_score)
+
+def compute_vibration_score(vibration) -> float:
+    try:
+        with stage("vibration_parse"):
+            vib_array = parse_vibration(vibration)
+        return float(score_vibration_batch([vib_array])[0])
+    except ModelNotReady:
+        raise
     except Exception as e:
         raise ValueError(f"Vibration processing failed: {str(e)}")
 
-def get_acoustic_score(audio_bytes: bytes) -> float:
-    mel = extract_mel(audio_bytes)
-    input_data = mel[np.newaxis, ..., np.newaxis]
-    prob = acoustic_model.predict(input_data, verbose=0)[0][0]
-    return float(prob)
+def compute_acoustic_score(audio) -> float:
+    registry.get("acoustic")  # fail fast before decoding audio
+    mel = extract_mel(audio)
+    return float(score_acoustic_batch([mel])[0])
 
-def get_temporal_score(sequence_str: str) -> float:
+def compute_temporal_score(sequence) -> float:
     try:
-        seq = np.array([float(x) for x in sequence_str.split(',')])
-        if len(seq) != LSTM_WINDOW:
-            raise ValueError(f"Sequence must have {LSTM_WINDOW} values")
-
-        input_seq = seq.reshape(1, LSTM_WINDOW, 1)
-        pred = lstm_model.predict(input_seq, verbose=0).flatten()[0]
-        actual = seq[-1]
-        error = abs(pred - actual)
-        prob = 1 / (1 + np.exp(-(error - 0.05) / 0.02))
-        return float(prob)
+        with stage("sequence_parse"):
+            seq = parse_sequence(sequence)
+        return float(score_temporal_batch([seq])[0])
+    except ModelNotReady:
+        raise
     except Exception as e:
         raise ValueError(f"Sequence processing failed: {str(e)}")
 
-def get_human_score(pir: int, image_bytes: Optional[bytes] = None) -> float:
+def parse_segment_samples(samples) -> np.ndarray:
+    """New sequence samples for a segment buffer"""
+    try:
+        with stage("sequence_parse"):
+            samples = parse_values(samples)
+        if samples.ndim != 1 or len(samples) == 0:
+            raise ValueError("expected at least one new value")
+        return samples
+    except ValueError as e:
+        raise ValueError(f"Sequence processing failed: {str(e)}")
+
+def preview_segment_sequence(segment_id: str, samples: np.ndarray, first_index: Optional[int] = None) -> tuple:
     """
-    Human detection using PIR sensor only.
-    YOLO image detection disabled - returns PIR value directly.
+    (latest LSTM window or None, samples held) the segment would have with the
+    new samples; the buffer only changes on commit_segment_sequence, once the
+    request has been scored
+    """
+    try:
+        return sequence_buffers.preview(segment_id, samples, first_index)
+    except ValueError as e:
+        raise ValueError(f"Sequence processing failed: {str(e)}")
+
+def commit_segment_sequence(segment_id: str, samples: np.ndarray, first_index: Optional[int] = None) -> tuple:
+    """Add new samples to a segment's buffer: (its latest LSTM window or None, samples held)"""
+    try:
+        return sequence_buffers.append(segment_id, samples, first_index)
+    except ValueError as e:
+        raise ValueError(f"Sequence processing failed: {str(e)}")
+
+def get_human_score(pir: int, person_confidence: Optional[float] = None) -> float:
+    """
+    Human presence: the PIR state, raised to the YOLO person confidence when an
+    image was checked (vision stage, see score_human)
+    """
+    if person_confidence is None:
+        return float(pir)
+    return max(float(pir), person_confidence)
+
+async def score_human(timings: dict, pir: int, image_bytes: Optional[bytes]) -> tuple:
+    """
+    (human score, vision status, detection future) for one request
+
+    Waits up to vision_deadline_ms for the person detection; past that the PIR
+    score stands in, the status is "provisional" and the caller gets the still
+    running future to publish a follow-up. Without an image (or with vision
+    disabled) the status is "pir_only"; a failed detection falls back to PIR.
     """
-    return float(pir)
+    if image_bytes is None or vision_stage is None:
+        return get_human_score(pir), "pir_only", None
+
+    start = time.perf_counter()
+    future = vision_stage.submit(image_bytes)
+    try:
+        confidence = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), settings.vision_deadline_ms / 1000.0
+        )
+        return get_human_score(pir, confidence), "complete", None
+    except asyncio.TimeoutError:
+        return get_human_score(pir), "provisional", future
+    except Exception as e:
+        metrics.count_error("/predict/intent", "vision")
+        print(f"❌ Vision stage failed: {e}")
+        return get_human_score(pir), "failed", None
+    finally:
+        timings["human"] = round((time.perf_counter() - start) * 1000, 2)
+
+def publish_vision_update(update_id: str, sensor_id: Optional[str], future, pir: int, scores: tuple, context_score: float):
+    """Once a late detection arrives, store the final fusion under update_id and push it to the sensor's /ws streams"""
+    try:
+        human_score = get_human_score(pir, future.result())
+        status = "complete"
+    except Exception as e:
+        metrics.count_error("/predict/intent", "vision")
+        print(f"❌ Vision stage failed: {e}")
+        human_score, status = get_human_score(pir), "failed"
+    result = fuse_scores(scores[0], scores[1], scores[2], human_score, context_score)
+    result.update({"update_id": update_id, "provisional": False, "vision": status})
+    pending_updates.resolve(update_id, result)
+    push_to_sensor(sensor_id, {"event": "intent:analysis:updated", "sensor_id": sensor_id, **result})
 
 def get_context_score(weather_ignore: bool) -> float:
     return 0.0 if weather_ignore else 1.0
 
+def fuse_scores(vib_score: Optional[float], acous_score: Optional[float], temp_score: Optional[float],
+                human_score: Optional[float], context_score: float) -> dict:
+    """
+    Weighted fusion of the modality scores into the /predict/intent response body
+
+    Modalities skipped by cascade fusion (or not available yet, like a segment's
+    unfilled sequence buffer) are None: they count as 0 in intent_score and
+    intent_bounds gives the range they could have moved it in.
+    """
+    scores = {"vibration": vib_score, "acoustic": acous_score, "human": human_score,
+              "temporal": temp_score, "context": context_score}
+    intent = weighted_sum(scores)
+
+    reasons = []
+    if (vib_score or 0) > 0.5: reasons.append(f"Abnormal vibration (score: {vib_score:.2f})")
+    if (acous_score or 0) > 0.5: reasons.append(f"Tool-like acoustic pattern (score: {acous_score:.2f})")
+    if (human_score or 0) > 0.5: reasons.append(f"Human presence detected (score: {human_score:.2f})")
+    if (temp_score or 0) > 0.5: reasons.append(f"Unplanned sequence detected (score: {temp_score:.2f})")
+    if context_score < 0.5: reasons.append("Event ignored due to weather/context")
+
+    alert = None
+    risk = risk_band(intent)
+    if risk is not None:
+        alert = {
+            "alert_id": "ALT-221",
+            "risk": risk,
+            "intent_score": round(intent, 3),
+            "reason": reasons
+        }
+
+    rounded = lambda score: None if score is None else round(score, 3)
+    result = {
+        "intent_score": round(intent, 3),
+        "individual_scores": {
+            "vibration_anomaly": rounded(vib_score),
+            "acoustic_tool": rounded(acous_score),
+            "human_presence": rounded(human_score),
+            "temporal_unplanned": rounded(temp_score),
+            "context": round(context_score, 3)
+        },
+        "reasons": reasons,
+        "alert_triggered": alert is not None,
+        "alert": alert
+    }
+    if None in scores.values():
+        result["intent_bounds"] = [round(bound, 3) for bound in intent_bounds(scores)]
+    return result
+
+# Cascade fusion order after context and PIR: cheapest scorer first (the CNN
+# also has to decode the audio and compute its mel spectrogram)
+CASCADE_STAGES = (
+    ("vibration", get_vibration_score),
+    ("temporal", get_temporal_score),
+    ("acoustic", get_acoustic_score)
+)
+
+async def cascade_scores(timings: dict, inputs: dict, context_score: float, human_range: tuple, human) -> tuple:
+    """
+    Score the modalities cheapest first, stopping once the risk band is decided
+
+    `human` is the score_human task: until it has a final score the human
+    modality may be anywhere in human_range (PIR state up to the person
+    confidence). Returns ({modality: score}, skipped stage names).
+    """
+    scores = {"context": context_score}
+    for i, (name, scorer) in enumerate(CASCADE_STAGES):
+        if human.done() and human.result()[1] != "provisional":
+            scores["human"] = human.result()[0]
+        if band_decided(*intent_bounds(scores, {"human": human_range})):
+            skipped = [stage_name for stage_name, _ in CASCADE_STAGES[i:]]
+            for stage_name in skipped:
+                metrics.CASCADE_SKIPPED.inc(stage=stage_name)
+            return scores, skipped
+        if inputs[name] is not None:
+            scores[name] = await run_stage(timings, name, scorer, inputs[name])
+    return scores, []
+
+async def read_array_input(name: str, text: Optional[str], upload: Optional[UploadFile],
+                           encoding: str, dtype: str):
+    """
+    Resolve a vibration/sequence input. Binary uploads and base64 text are decoded
+    here (zero-copy views); CSV text is returned as-is and parsed in the scorer thread.
+    """
+    check_upload(name, upload, settings.max_array_bytes)
+    check_size(name, len(text) if text is not None else None, settings.max_array_bytes)
+    try:
+        if upload is not None:
+            with stage("upload_read"):
+                data = await upload.read()
+            return decode_binary(data, dtype)
+        if text is None:
+            raise ValueError("no data provided")
+        if encoding == "csv":
+            return text
+        return decode_text(text, encoding, dtype)
+    except ValueError as e:
+        raise ValueError(f"{name} processing failed: {str(e)}")
+
+async def run_stage(timings: dict, name: str, fn, *args):
+    """Run a blocking scorer on the scorer pool and record its wall time (ms) under `name`"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # Run in a copy of the request's context so stage timings reach its trace
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    try:
+        return await loop.run_in_executor(scorer_pool, call)
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+def error_cause(e: Exception) -> str:
+    """Short cause label for a rejected request or batch record (for the error counters)"""
+    if isinstance(e, ModelNotReady):
+        return "model_not_ready"
+    if isinstance(e, json.JSONDecodeError):
+        return "records_json"
+    if isinstance(e, PayloadTooLarge):
+        return "payload_too_large"
+    message = str(e)
+    for prefix, cause in (("Vibration", "vibration"), ("Sequence", "sequence"), ("Audio", "audio")):
+        if message.startswith(prefix):
+            return cause
+    return "other"
+
+def reject(path: str, e: Exception) -> HTTPException:
+    """Count a failed request by cause and map it to 503 (model not ready), 413 (too large) or 422"""
+    metrics.count_error(path, error_cause(e))
+    if isinstance(e, PayloadTooLarge):
+        return e
+    if isinstance(e, ModelNotReady):
+        return HTTPException(status_code=503, detail=str(e))
+    return HTTPException(status_code=422, detail=str(e))
+
+def check_archive_key(sensor_id: Optional[str]):
+    """Reject a sensor ID the archive could not store (only while archiving; None becomes "unassigned")"""
+    if archive_writer is not None and sensor_id is not None:
+        check_sensor_id(sensor_id)
+
+def archive_scored(sensor_id, vibration, sequence, audio, pir, weather_ignore, scores: dict):
+    """
+    Queue a scored record for the archive (no-op unless GUARDRAIL_ARCHIVE_DIR is set)
+
+    `scores` are the unrounded model outputs by fusion modality (vibration,
+    acoustic, human, temporal, context); None for skipped ones, archived as NaN.
+    `audio` is encoded bytes (decoded on the writer thread) or 16 kHz samples.
+    """
+    if archive_writer is not None:
+        archive_writer.submit(archive_row, sensor_id, vibration, sequence, audio,
+                              pir, weather_ignore, scores, time.time())
+
+def read_spooled(upload) -> bytes:
+    """All bytes of a spooled upload file, from the start"""
+    upload.seek(0)
+    return upload.read()
+
+def archive_row(sensor_id, vibration, sequence, audio, pir, weather_ignore, scores: dict, timestamp: float):
+    """Archive columns for one record; runs on the archive writer thread, so parsing happens there"""
+    if isinstance(audio, bytes):
+        audio, sr = decode_audio(audio)
+        if sr != TARGET_SR:
+            audio = mel_frontend.resample(audio, sr)
+    scalars = {f"{name}_score": np.nan if score is None else score for name, score in scores.items()}
+    scalars.update({"intent_score": weighted_sum(scores), "pir": pir, "weather_ignore": weather_ignore})
+    samples = {"vibration": parse_values(vibration), "audio": audio,
+               "sequence": () if sequence is None else parse_values(sequence)}
+    return sensor_id or "unassigned", scalars, samples, timestamp
+
+def with_debug_timing(result: dict, x_debug_timing: Optional[str]) -> dict:
+    """Attach the request's fine-grained stage breakdown when X-Debug-Timing was sent"""
+    trace = metrics.current_trace()
+    if x_debug_timing and trace is not None:
+        result["debug_timing_ms"] = metrics.trace_breakdown(trace)
+    return result
+
 # ========================
 # Main Endpoint
 # ========================
 @app.post("/predict/intent")
 async def predict_intent(
-    vibration: str = Form(..., description="Comma separated vibration values"),
+    vibration: Optional[str] = Form(None, description="Comma separated vibration values (or base64, see array_encoding)"),
     acoustic_file: UploadFile = File(..., description="Audio chunk .wav (5-10s)"),
-    sequence: str = Form(..., description="Comma separated sequence values for LSTM (60 values)"),
+    sequence: Optional[str] = Form(None, description="Comma separated sequence values for LSTM (60 values, or only the new ones with segment_id)"),
     pir: int = Form(..., ge=0, le=1, description="PIR state: 0 or 1"),
     image_file: Optional[UploadFile] = File(None, description="Optional CCTV/drone image .jpg"),
-    weather_ignore: bool = Form(False, description="Weather/context filter: true=ignore event")
+    weather_ignore: bool = Form(False, description="Weather/context filter: true=ignore event"),
+    vibration_file: Optional[UploadFile] = File(None, description="Binary vibration samples instead of `vibration`: raw little-endian floats or .npy"),
+    sequence_file: Optional[UploadFile] = File(None, description="Binary sequence samples instead of `sequence`: raw little-endian floats or .npy"),
+    array_encoding: str = Form("csv", description="Encoding of the vibration/sequence text fields: csv or base64"),
+    vibration_encoding: Optional[str] = Form(None, description="Encoding of `vibration` alone (csv or base64), overriding array_encoding"),
+    sequence_encoding: Optional[str] = Form(None, description="Encoding of `sequence` alone (csv or base64), overriding array_encoding"),
+    array_dtype: str = Form("float32", description="Sample type of raw binary/base64 payloads: float32 or float64"),
+    segment_id: Optional[str] = Form(None, description="Track segment / sensor ID: `sequence` then holds only the samples since the last call"),
+    sequence_index: Optional[int] = Form(None, ge=0, description="With segment_id: stream position of the first `sequence` sample, so retried samples are not buffered twice"),
+    sensor_id: Optional[str] = Form(None, description="Sensor post the readings come from (archive key; defaults to segment_id)"),
+    x_debug_timing: Optional[str] = Header(None, description="Send any value to get the per-stage breakdown inline as debug_timing_ms")
 ):
+    metrics.record_since_request_start("form_parse")
     try:
-        audio_bytes = await acoustic_file.read()
-        image_bytes = await image_file.read() if image_file else None
+        request_start = time.perf_counter()
+        timings = {}
+
+        # Uploads stay in their spool files (on disk past 1 MiB); the decoder reads them from there
+        check_upload("acoustic_file", acoustic_file, settings.max_audio_bytes)
+        check_upload("image_file", image_file, settings.max_image_bytes)
+        audio = acoustic_file.file
+        check_archive_key(sensor_id or segment_id)
+        # The vision stage may outlive the request (provisional results), so it gets the image's bytes
+        image_bytes = None
+        if image_file is not None and vision_stage is not None:
+            with stage("upload_read"):
+                image_bytes = await image_file.read()
+        vibration = await read_array_input("Vibration", vibration, vibration_file,
+                                           vibration_encoding or array_encoding, array_dtype)
+        sequence = await read_array_input("Sequence", sequence, sequence_file,
+                                          sequence_encoding or array_encoding, array_dtype)
+        if segment_id is not None:
+            # Scored against the buffer plus the new samples; they are only
+            # buffered once the request succeeds (temporal is null until it is full)
+            new_samples = await run_stage(timings, "buffer", parse_segment_samples, sequence)
+            sequence, buffered = preview_segment_sequence(segment_id, new_samples, sequence_index)
 
-        vib_score = get_vibration_score(vibration)
-        acous_score = get_acoustic_score(audio_bytes)
-        temp_score = get_temporal_score(sequence)
-        human_score = get_human_score(pir, image_bytes)
         context_score = get_context_score(weather_ignore)
+        inputs = {"vibration": vibration, "acoustic": audio, "temporal": sequence}
+        human = asyncio.ensure_future(score_human(timings, pir, image_bytes))
+        if settings.fusion_mode == "cascade":
+            vision_pending = image_bytes is not None and vision_stage is not None
+            human_range = (float(pir), 1.0 if vision_pending else float(pir))
+            scores, skipped = await cascade_scores(timings, inputs, context_score, human_range, human)
+        else:
+            # Modalities are independent: run them concurrently so latency tracks the slowest branch
+            stages = [(name, scorer) for name, scorer in CASCADE_STAGES if inputs[name] is not None]
+            scored = await asyncio.gather(*(
+                run_stage(timings, name, scorer, inputs[name]) for name, scorer in stages
+            ))
+            scores, skipped = dict(zip((name for name, _ in stages), scored)), []
+        human_score, vision_status, vision_future = await human
+        vib_score, acous_score, temp_score = scores.get("vibration"), scores.get("acoustic"), scores.get("temporal")
+        timings["total"] = round((time.perf_counter() - request_start) * 1000, 2)
+
+        result = fuse_scores(vib_score, acous_score, temp_score, human_score, context_score)
+        if archive_writer is not None:
+            # The upload's spool file is closed with the request, so the archive
+            # gets its bytes; read them on the scorer pool, not the event loop
+            audio = await asyncio.get_running_loop().run_in_executor(scorer_pool, read_spooled, audio)
+        archive_scored(sensor_id or segment_id, vibration, sequence, audio, pir, weather_ignore, {
+            "vibration": vib_score, "acoustic": acous_score, "human": human_score,
+            "temporal": temp_score, "context": context_score
+        })
+        if segment_id is not None:
+            commit_segment_sequence(segment_id, new_samples, sequence_index)
+            result["sequence_buffered"] = buffered
+        result["skipped_stages"] = skipped
+        result["provisional"] = vision_future is not None
+        result["vision"] = vision_status
+        if vision_future is not None:
+            update_id = uuid.uuid4().hex
+            pending_updates.open(update_id)
+            result["update_id"] = update_id
+            vision_future.add_done_callback(functools.partial(
+                publish_vision_update, update_id, sensor_id or segment_id, pir=pir,
+                scores=(vib_score, acous_score, temp_score), context_score=context_score
+            ))
+        result["timing_ms"] = timings
+        return with_debug_timing(result, x_debug_timing)
 
-        intent = (
-            0.35 * vib_score +
-            0.30 * acous_score +
-            0.20 * human_score +
-            0.10 * temp_score +
-            0.05 * context_score
-        )
-
-        reasons = []
-        if vib_score > 0.5: reasons.append(f"Abnormal vibration (score: {vib_score:.2f})")
-        if acous_score > 0.5: reasons.append(f"Tool-like acoustic pattern (score: {acous_score:.2f})")
-        if human_score > 0.5: reasons.append(f"Human presence detected (score: {human_score:.2f})")
-        if temp_score > 0.5: reasons.append(f"Unplanned sequence detected (score: {temp_score:.2f})")
-        if context_score < 0.5: reasons.append("Event ignored due to weather/context")
-
-        alert = None
-        if intent > 0.5:
-            alert = {
-                "alert_id": "ALT-221",
-                "risk": "high" if intent > 0.75 else "medium",
-                "intent_score": round(intent, 3),
-                "reason": reasons
+    except Exception as e:
+        raise reject("/predict/intent", e)
+
+def prepare_batch_record(record, audio) -> dict:
+    """Validate one batch record and decode its inputs; raises ValueError naming the bad field"""
+    if not isinstance(record, dict):
+        raise ValueError("Record must be a JSON object")
+    for field in ("vibration", "sequence", "pir"):
+        if field not in record:
+            raise ValueError(f"Missing field '{field}'")
+    if record["pir"] not in (0, 1):
+        raise ValueError("PIR state must be 0 or 1")
+    check_archive_key(record.get("sensor_id"))
+
+    encoding = record.get("encoding", "csv")
+    dtype = record.get("dtype", "float32")
+    try:
+        vibration = record["vibration"]
+        if isinstance(vibration, str):
+            vibration = decode_text(vibration, record.get("vibration_encoding", encoding), dtype)
+        vib_array = parse_vibration(vibration)
+    except Exception as e:
+        raise ValueError(f"Vibration processing failed: {str(e)}")
+    try:
+        sequence = record["sequence"]
+        if isinstance(sequence, str):
+            sequence = decode_text(sequence, record.get("sequence_encoding", encoding), dtype)
+        seq = parse_sequence(sequence)
+    except Exception as e:
+        raise ValueError(f"Sequence processing failed: {str(e)}")
+    audio = load_audio(audio)
+
+    return {
+        "vibration": vib_array,
+        "sequence": seq,
+        "audio": audio,
+        "pir": int(record["pir"]),
+        "weather_ignore": bool(record.get("weather_ignore", False)),
+        "sensor_id": record.get("sensor_id")
+    }
+
+def prepare_batch(records: list, audio_files: list) -> tuple:
+    """Decode every record, keeping per-record errors instead of failing the whole batch"""
+    prepared, errors = [], []
+    for record, audio in zip(records, audio_files):
+        try:
+            prepared.append(prepare_batch_record(record, audio))
+            errors.append(None)
+        except Exception as e:
+            metrics.count_error("/predict/intent/batch", error_cause(e))
+            prepared.append(None)
+            errors.append(str(e))
+
+    # One FFT / filterbank pass over the audio of every valid record
+    ok = [p for p in prepared if p is not None]
+    if ok:
+        with stage("mel"):
+            mels = mel_frontend.transform([p["audio"] for p in ok])
+        for p, mel in zip(ok, mels):
+            p["mel"] = mel
+    return prepared, errors
+
+@app.get("/predict/intent/updates/{update_id}")
+async def intent_update(update_id: str):
+    """Final result of a provisional /predict/intent response: 202 while its vision result is pending"""
+    found, result = pending_updates.get(update_id)
+    if not found:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired update '{update_id}'")
+    if result is None:
+        return JSONResponse(status_code=202, content={"update_id": update_id, "provisional": True, "pending": ["vision"]})
+    return result
+
+@app.post("/predict/intent/batch")
+async def predict_intent_batch(
+    records: str = Form(..., description="JSON array of records: {vibration, sequence, pir: 0|1, weather_ignore: bool, sensor_id, encoding: csv|base64, vibration_encoding, sequence_encoding, dtype: float32|float64}; vibration/sequence are number arrays or strings in `encoding` (or their own *_encoding)"),
+    acoustic_files: List[UploadFile] = File(..., description="One audio chunk .wav per record, in record order"),
+    x_debug_timing: Optional[str] = Header(None, description="Send any value to get the per-stage breakdown inline as debug_timing_ms")
+):
+    """
+    Score many sensor posts in one call. Results come back in record order using the
+    /predict/intent schema; a record that fails validation gets {"error": ...} instead.
+    """
+    metrics.record_since_request_start("form_parse")
+    try:
+        request_start = time.perf_counter()
+        timings = {}
+
+        records = json.loads(records)
+        if not isinstance(records, list) or not records:
+            raise ValueError("records must be a non-empty JSON array")
+        if len(records) > settings.batch_request_max_records:
+            raise ValueError(f"At most {settings.batch_request_max_records} records per batch")
+        if len(acoustic_files) != len(records):
+            raise ValueError(f"Expected {len(records)} acoustic files, got {len(acoustic_files)}")
+
+        for f in acoustic_files:
+            check_upload(f"acoustic_files ({f.filename})", f, settings.max_audio_bytes)
+        audio_files = [f.file for f in acoustic_files]
+        prepared, errors = await run_stage(timings, "decode", prepare_batch, records, audio_files)
+        ok = [p for p in prepared if p is not None]
+
+        if ok:
+            vib_scores, acous_scores, temp_scores = await asyncio.gather(
+                run_stage(timings, "vibration", score_vibration_batch, [p["vibration"] for p in ok]),
+                run_stage(timings, "acoustic", score_acoustic_batch, [p["mel"] for p in ok]),
+                run_stage(timings, "temporal", score_temporal_batch, [p["sequence"] for p in ok])
+            )
+
+        results, j = [], 0
+        for p, error in zip(prepared, errors):
+            if p is None:
+                results.append({"error": error})
+                continue
+            scores = {
+                "vibration": float(vib_scores[j]),
+                "acoustic": float(acous_scores[j]),
+                "human": get_human_score(p["pir"]),
+                "temporal": float(temp_scores[j]),
+                "context": get_context_score(p["weather_ignore"])
             }
+            result = fuse_scores(scores["vibration"], scores["acoustic"], scores["temporal"],
+                                 scores["human"], scores["context"])
+            archive_scored(p["sensor_id"], p["vibration"], p["sequence"], p["audio"],
+                           p["pir"], p["weather_ignore"], scores)
+            results.append(result)
+            j += 1
+        timings["total"] = round((time.perf_counter() - request_start) * 1000, 2)
+
+        return with_debug_timing({
+            "count": len(results),
+            "failed": sum(e is not None for e in errors),
+            "results": results,
+            "timing_ms": timings
+        }, x_debug_timing)
 
-        return {
-            "intent_score": round(intent, 3),
-            "individual_scores": {
-                "vibration_anomaly": round(vib_score, 3),
-                "acoustic_tool": round(acous_score, 3),
-                "human_presence": round(human_score, 3),
-                "temporal_unplanned": round(temp_score, 3),
-                "context": round(context_score, 3)
-            },
-            "reasons": reasons,
-            "alert_triggered": alert is not None,
-            "alert": alert
-        }
+    except Exception as e:
+        raise reject("/predict/intent/batch", e)
+
+@app.post("/predict/vibration")
+async def predict_vibration(
+    vibration: Optional[str] = Form(None, description="Comma separated vibration values (or base64, see array_encoding)"),
+    vibration_file: Optional[UploadFile] = File(None, description="Binary vibration samples: raw little-endian floats or .npy"),
+    array_encoding: str = Form("csv", description="Encoding of the vibration text field: csv or base64"),
+    array_dtype: str = Form("float32", description="Sample type of raw binary/base64 payloads: float32 or float64"),
+    x_debug_timing: Optional[str] = Header(None, description="Send any value to get the per-stage breakdown inline as debug_timing_ms")
+):
+    """Vibration anomaly score alone; the only scorer a vibration-only deployment loads"""
+    metrics.record_since_request_start("form_parse")
+    try:
+        timings = {}
+        vibration = await read_array_input("Vibration", vibration, vibration_file, array_encoding, array_dtype)
+        vib_score = await run_stage(timings, "vibration", get_vibration_score, vibration)
+        return with_debug_timing({
+            "vibration_anomaly": round(vib_score, 3),
+            "timing_ms": timings
+        }, x_debug_timing)
+    except Exception as e:
+        raise reject("/predict/vibration", e)
+
+@app.post("/predict/temporal")
+async def predict_temporal(
+    segment_id: str = Form(..., description="Track segment / sensor ID whose sequence buffer to extend"),
+    sequence: Optional[str] = Form(None, description="New sequence values since the last call (or base64, see array_encoding)"),
+    sequence_index: Optional[int] = Form(None, ge=0, description="Stream position of the first new sample, so retried samples are not buffered twice"),
+    sequence_file: Optional[UploadFile] = File(None, description="New sequence samples as raw little-endian floats or .npy"),
+    array_encoding: str = Form("csv", description="Encoding of the sequence text field: csv or base64"),
+    array_dtype: str = Form("float32", description="Sample type of raw binary/base64 payloads: float32 or float64"),
+    x_debug_timing: Optional[str] = Header(None, description="Send any value to get the per-stage breakdown inline as debug_timing_ms")
+):
+    """
+    Append new samples to a segment's sequence buffer and score its latest window.
+    temporal_unplanned is null until the segment has buffered a full window.
+    """
+    metrics.record_since_request_start("form_parse")
+    try:
+        timings = {}
+        sequence = await read_array_input("Sequence", sequence, sequence_file, array_encoding, array_dtype)
+        new_samples = await run_stage(timings, "buffer", parse_segment_samples, sequence)
+        window, count = preview_segment_sequence(segment_id, new_samples, sequence_index)
+        temp_score = None
+        if window is not None:
+            temp_score = round(await run_stage(timings, "temporal", get_temporal_score, window), 3)
+        commit_segment_sequence(segment_id, new_samples, sequence_index)
+        return with_debug_timing({
+            "segment_id": segment_id,
+            "buffered": count,
+            "window": LSTM_WINDOW,
+            "temporal_unplanned": temp_score,
+            "timing_ms": timings
+        }, x_debug_timing)
+    except Exception as e:
+        raise reject("/predict/temporal", e)
+
+@app.delete("/segments/{segment_id}")
+async def reset_segment(segment_id: str):
+    """Drop a segment's buffered sequence samples (e.g. after a sensor restart)"""
+    if not sequence_buffers.reset(segment_id):
+        raise HTTPException(status_code=404, detail=f"No sequence buffer for segment '{segment_id}'")
+    return {"segment_id": segment_id, "reset": True}
+
+@app.get("/segments/stats")
+async def segment_stats():
+    """How many segment buffers are held, against their limit"""
+    return sequence_buffers.stats()
+
+# ========================
+# Fan-in Endpoints
+# ========================
+async def score_fanin_reading(timings: dict, segment_id: str, modality: str, value: Optional[str],
+                              upload: Optional[UploadFile], encoding: str, dtype: str,
+                              sequence_index: Optional[int] = None):
+    """
+    Turn one fan-in event into its window reading, scoring it on arrival
 
+    Vibration, audio and sequence readings become (score, raw input), so a bad
+    payload is rejected to the device that sent it and fusing a window needs no
+    model. PIR and weather readings are their flags. Sequence samples go to the
+    segment's buffer (like segment_id on /predict/intent); the reading is None
+    until it holds a full LSTM window.
+    """
+    if modality == "audio":
+        check_upload("file", upload, settings.max_audio_bytes)
+        if upload is None:
+            raise ValueError("Audio processing failed: no file provided")
+        with stage("upload_read"):
+            audio = await upload.read()
+        return await run_stage(timings, "acoustic", get_acoustic_score, audio), audio
+    if modality == "vibration":
+        vibration = await read_array_input("Vibration", value, upload, encoding, dtype)
+        return await run_stage(timings, "vibration", get_vibration_score, vibration), vibration
+    if modality == "sequence":
+        samples = await read_array_input("Sequence", value, upload, encoding, dtype)
+        samples = await run_stage(timings, "buffer", parse_segment_samples, samples)
+        window, _ = preview_segment_sequence(segment_id, samples, sequence_index)
+        score = None
+        if window is not None:
+            score = await run_stage(timings, "temporal", get_temporal_score, window)
+        commit_segment_sequence(segment_id, samples, sequence_index)
+        return None if window is None else (score, window)
+    if modality == "pir":
+        if value not in ("0", "1"):
+            raise ValueError("PIR state must be 0 or 1")
+        return int(value)
+    if modality == "weather":
+        if value is None or value.lower() not in ("true", "false", "1", "0"):
+            raise ValueError("Weather flag must be true or false")
+        return value.lower() in ("true", "1")
+    raise ValueError(f"Unknown modality '{modality}', expected one of {', '.join(MODALITIES)}")
+
+def fuse_window(window) -> dict:
+    """
+    Fuse a handed-over fan-in window with the existing weights
+
+    Modalities that never arrived are None: they count as 0 in intent_score and
+    intent_bounds gives the range they could still have moved it in.
+    """
+    scored = {m: window.value(m, (None, None)) for m in ("vibration", "audio", "sequence")}
+    pir = window.value("pir")
+    weather_ignore = window.value("weather", False)
+    scores = {
+        "vibration": scored["vibration"][0], "acoustic": scored["audio"][0],
+        "human": None if pir is None else get_human_score(pir),
+        "temporal": scored["sequence"][0], "context": get_context_score(weather_ignore)
+    }
+    result = fuse_scores(scores["vibration"], scores["acoustic"], scores["temporal"],
+                         scores["human"], scores["context"])
+    result.update(window.describe())
+    result["missing"] = window.missing(fanin.required)
+    if pir is not None and all(m in window.readings for m in scored):
+        archive_scored(window.segment_id, scored["vibration"][1], scored["sequence"][1], scored["audio"][1],
+                       pir, weather_ignore, scores)
+    return result
+
+def publish_fanin_window(window) -> dict:
+    """Fuse a window, keep it as the segment's latest result and push it to the segment's /ws streams"""
+    result = fuse_window(window)
+    fanin.record(window.segment_id, result)
+    push_to_sensor(window.segment_id, {"event": "intent:analysis:updated", "sensor_id": window.segment_id, **result})
+    return result
+
+async def sweep_fanin():
+    """Fuse fan-in windows whose deadline has passed, until shutdown"""
+    while True:
+        await asyncio.sleep(FANIN_SWEEP_SECONDS)
+        try:
+            for window in fanin.expired():
+                publish_fanin_window(window)
+        except Exception as e:
+            print(f"❌ Fan-in sweep failed: {e}")
+
+@app.post("/fanin/events")
+async def fanin_event(
+    segment_id: str = Form(..., description="Track segment the reading belongs to"),
+    modality: str = Form(..., description="vibration, audio, sequence, pir or weather"),
+    timestamp: Optional[float] = Form(None, description="Unix time the reading was taken (defaults to its arrival)"),
+    value: Optional[str] = Form(None, description="Vibration/sequence values (csv or base64, see array_encoding), PIR state 0/1 or weather_ignore true/false"),
+    file: Optional[UploadFile] = File(None, description="Audio chunk .wav, or binary vibration/sequence samples instead of `value`"),
+    array_encoding: str = Form("csv", description="Encoding of vibration/sequence text values: csv or base64"),
+    array_dtype: str = Form("float32", description="Sample type of raw binary/base64 payloads: float32 or float64"),
+    sequence_index: Optional[int] = Form(None, ge=0, description="Stream position of the first sequence sample, so retried samples are not buffered twice"),
+    x_debug_timing: Optional[str] = Header(None, description="Send any value to get the per-stage breakdown inline as debug_timing_ms")
+):
+    """
+    One modality reading from one device. Readings are aligned per segment into
+    event-time windows; every window fused because of this event (completed, or
+    pushed out by the open-window limit) is returned under `fused`.
+    """
+    metrics.record_since_request_start("form_parse")
+    try:
+        timings = {}
+        if modality not in MODALITIES:
+            raise ValueError(f"Unknown modality '{modality}', expected one of {', '.join(MODALITIES)}")
+        if timestamp is not None and not math.isfinite(timestamp):
+            raise ValueError(f"Timestamp must be a finite number of seconds, got {timestamp}")
+        check_archive_key(segment_id)
+        reading = await score_fanin_reading(timings, segment_id, modality, value, file, array_encoding, array_dtype,
+                                            sequence_index)
+        result = {"segment_id": segment_id, "modality": modality}
+        if reading is None:
+            result.update({"accepted": True, "buffering": True, "fused": []})
+        else:
+            accepted, ready = fanin.add(segment_id, modality, reading, timestamp)
+            result.update({"accepted": accepted, "buffering": False,
+                           "fused": [publish_fanin_window(window) for window in ready]})
+        result["timing_ms"] = timings
+        return with_debug_timing(result, x_debug_timing)
     except Exception as e:
-        raise HTTPException(status_code=422, detail=str(e))
+        raise reject("/fanin/events", e)
+
+@app.get("/fanin/segments/{segment_id}")
+async def fanin_segment(segment_id: str):
+    """A segment's latest fused fan-in result"""
+    result = fanin.latest(segment_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No fused fan-in window for segment '{segment_id}'")
+    return result
+
+@app.delete("/fanin/segments/{segment_id}")
+async def reset_fanin_segment(segment_id: str):
+    """Drop a segment's open fan-in windows and latest result"""
+    if not fanin.reset(segment_id):
+        raise HTTPException(status_code=404, detail=f"No fan-in windows for segment '{segment_id}'")
+    return {"segment_id": segment_id, "reset": True}
+
+@app.get("/fanin/stats")
+async def fanin_stats():
+    """Open fan-in segments and windows, and windows fused by trigger"""
+    return fanin.stats()
+
+# ========================
+# Streaming Endpoint
+# ========================
+# Open /ws connections per sensor, for results produced outside the stream (late vision updates)
+sensor_sockets = {}
+
+def push_to_sensor(sensor_id: Optional[str], event: dict):
+    """Send an event to every /ws stream of this sensor; safe to call from any thread"""
+    for websocket, loop in list(sensor_sockets.get(sensor_id, ())) if sensor_id else ():
+        asyncio.run_coroutine_threadsafe(websocket.send_json(event), loop)
+
+def score_stream_frame(stream: SensorStream, frame: bytes) -> dict:
+    """Feed one binary frame and score the windows it completed, per modality, oldest first"""
+    with stage("stream_feed"):
+        windows = stream.feed(frame)
+    scores = {}
+    if len(windows.get("vibration", ())):
+        scores["vibration"] = score_vibration_features(windows["vibration"])
+    if windows.get("audio"):
+        scores["acoustic"] = score_acoustic_batch(windows["audio"])
+    if windows.get("sequence"):
+        scores["temporal"] = score_temporal_batch(windows["sequence"])
+    return scores
+
+def stream_events(stream: SensorStream, state: dict, scores: dict) -> list:
+    """score/intent/alert events for new window scores, fusing the latest score of each modality"""
+    events = []
+    for modality, values in scores.items():
+        state["scores"][modality] = float(values[-1])
+        events.append({
+            "event": "score:updated",
+            "sensor_id": stream.sensor_id,
+            "modality": modality,
+            "score": round(float(values[-1]), 3),
+            "windows": len(values)
+        })
+    if scores or state.get("context_changed"):
+        events.extend(fuse_stream(stream, state))
+    return events
+
+def fuse_stream(stream: SensorStream, state: dict) -> list:
+    latest = state["scores"]
+    state["context_changed"] = False
+    if not all(m in latest for m in ("vibration", "acoustic", "temporal")):
+        return []
+
+    result = fuse_scores(
+        latest["vibration"], latest["acoustic"], latest["temporal"],
+        get_human_score(stream.pir), get_context_score(stream.weather_ignore)
+    )
+    events = [{"event": "intent:analysis:updated", "sensor_id": stream.sensor_id, **result}]
+
+    previous = state.get("alert")
+    alert = result["alert"]
+    if alert and not previous:
+        events.append({"event": "alert:created", "sensor_id": stream.sensor_id, "alert": alert})
+    elif alert and previous and alert["risk"] != previous["risk"]:
+        events.append({"event": "alert:updated", "sensor_id": stream.sensor_id, "alert": alert})
+    elif previous and not alert:
+        events.append({"event": "alert:resolved", "sensor_id": stream.sensor_id, "alert": previous})
+    state["alert"] = alert
+    return events
+
+def apply_stream_message(stream: SensorStream, state: dict, message: dict) -> list:
+    """Handle a JSON control message: {"type": "config", ...} or {"type": "context", pir, weather_ignore}"""
+    kind = message.get("type") if isinstance(message, dict) else None
+    options = {k: v for k, v in message.items() if k != "type"} if kind else {}
+    if kind == "config":
+        stream.configure(**options)
+        state["scores"].clear()
+        return [{"event": "stream:configured", "sensor_id": stream.sensor_id, "config": options}]
+    if kind == "context":
+        if "pir" in options:
+            if options["pir"] not in (0, 1):
+                raise ValueError("PIR state must be 0 or 1")
+            stream.pir = int(options["pir"])
+        if "weather_ignore" in options:
+            stream.weather_ignore = bool(options["weather_ignore"])
+        state["context_changed"] = True
+        return fuse_stream(stream, state)
+    raise ValueError("Control messages must be JSON objects with type 'config' or 'context'")
+
+@app.websocket("/ws")
+async def sensor_stream(websocket: WebSocket, sensor_id: Optional[str] = None):
+    """
+    Continuous scoring for one sensor post.
+
+    Binary frames carry samples, tagged by their first byte: 0x01 vibration
+    (float32 by default), 0x02 PCM audio (int16 at 16 kHz by default), 0x03
+    sequence samples. Audio updates a rolling mel spectrogram hop by hop and is
+    scored every second. Every completed window is scored and pushed back as
+    score:updated, and once all three modalities have a score, as
+    intent:analysis:updated plus alert:created / alert:updated / alert:resolved.
+    JSON text frames change the stream's config or its PIR / weather context.
+    """
+    await websocket.accept()
+    stream = SensorStream(mel_frontend, sensor_id=sensor_id)
+    state = {"scores": {}, "alert": None}
+    loop = asyncio.get_running_loop()
+    connection = (websocket, loop)
+    if sensor_id:
+        sensor_sockets.setdefault(sensor_id, set()).add(connection)
+    metrics.WS_CONNECTIONS.inc()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                if message.get("bytes") is not None:
+                    metrics.WS_FRAMES.inc(kind="binary")
+                    # Frames of one connection are handled one at a time, so the
+                    # stream's state is never touched by two scorer threads at once
+                    scores = await loop.run_in_executor(
+                        scorer_pool, score_stream_frame, stream, message["bytes"]
+                    )
+                    events = stream_events(stream, state, scores)
+                else:
+                    metrics.WS_FRAMES.inc(kind="text")
+                    events = apply_stream_message(stream, state, json.loads(message.get("text") or "null"))
+            except (ValueError, TypeError, ModelNotReady) as e:
+                metrics.count_error("/ws", error_cause(e))
+                events = [{"event": "error", "sensor_id": stream.sensor_id, "detail": str(e)}]
+            for event in events:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.WS_CONNECTIONS.dec()
+        if sensor_id:
+            sensor_sockets.get(sensor_id, set()).discard(connection)
+            if not sensor_sockets.get(sensor_id):
+                sensor_sockets.pop(sensor_id, None)
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "models": "all loaded"}
+    """Liveness: the process is up and serving, whatever state the models are in"""
+    return {"status": "healthy", "models": registry.status()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage/request histograms, error counters and model state in Prometheus text format"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Score cache size and hit/miss/eviction counters per modality"""
+    return score_cache.stats()
+
+@app.post("/models/{name}/reload")
+async def reload_model(name: str):
+    """
+    Load a model again after its files were replaced, then drop its cached scores
+
+    Requests keep scoring with the old model until the new one has loaded, and
+    keep it if loading fails (500). Each worker process holds its own models.
+    """
+    if name not in registry.status():
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'")
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, registry.reload, name)
+    except ModelNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reloading model '{name}' failed, still serving the previous one: {e}")
+    modality = CACHED_MODALITIES.get(name)
+    invalidated = score_cache.invalidate(modality) if modality else 0
+    return {"model": name, **registry.status()[name], "cache_invalidated": invalidated}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once every enabled model is loaded, 503 before that (or if one failed)"""
+    is_ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": registry.status()}
+    )
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request, exc):
+    """Missing/invalid form fields are rejected by FastAPI before the handler runs; count them too"""
+    metrics.count_error(request.url.path, "request_validation")
+    return await request_validation_exception_handler(request, exc)
+
+def collect_model_metrics():
+    for name, status in registry.status().items():
+        metrics.MODEL_READY.set(int(status["state"] == "ready"), model=name)
+        if status["load_seconds"] is not None:
+            metrics.MODEL_LOAD_SECONDS.set(status["load_seconds"], model=name)
+
+def collect_buffer_metrics():
+    metrics.SEQUENCE_SEGMENTS.set(sequence_buffers.stats()["segments"])
+    stats = fanin.stats()
+    metrics.FANIN_OPEN_WINDOWS.set(stats["open_windows"])
+    metrics.FANIN_LATE_EVENTS.set(stats["late"])
+    for trigger in ("complete", "deadline", "overflow", "evicted"):
+        metrics.FANIN_WINDOWS.set(stats[trigger], trigger=trigger)
+    if archive_writer is not None:
+        stats = archive_writer.stats()
+        metrics.ARCHIVE_PENDING.set(stats["pending"])
+        for outcome in ("written", "dropped", "failed"):
+            metrics.ARCHIVE_ROWS.set(stats[outcome], outcome=outcome)
+
+metrics.REGISTRY.add_collector(collect_model_metrics)
+metrics.REGISTRY.add_collector(collect_buffer_metrics)
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        route.path: settings.max_batch_request_bytes if route.path == "/predict/intent/batch" else settings.max_request_bytes
+        for route in app.routes if "POST" in getattr(route, "methods", ())
+    },
+    default_limit=settings.max_request_bytes,
+    # Enforced per multipart part while the body streams in; the fan-in `file` is
+    # audio or array samples, so it gets the larger limit until its modality is known
+    part_limits={
+        **dict.fromkeys(("acoustic_file", "acoustic_files"), settings.max_audio_bytes),
+        "image_file": settings.max_image_bytes,
+        **dict.fromkeys(("vibration", "sequence", "vibration_file", "sequence_file", "value"), settings.max_array_bytes),
+        "file": 0 if 0 in (settings.max_audio_bytes, settings.max_array_bytes) else max(settings.max_audio_bytes, settings.max_array_bytes)
+    }
+)
+app.add_middleware(metrics.MetricsMiddleware, paths={route.path for route in app.routes})
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,304 @@
+"""
+metrics.py
+In-process metrics for the inference API, exported in the Prometheus text format.
+Stage timings are recorded with `with stage("mel"): ...`; each one feeds a
+histogram and, while a request is being traced, that request's own breakdown
+(returned inline when the client sends an X-Debug-Timing header).
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Stage latencies range from tens of microseconds (CSV parsing) to seconds
+# (a cold CNN batch), so the buckets start well below Prometheus' defaults
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_trace = contextvars.ContextVar("guardrail_trace", default=None)
+_trace_start = contextvars.ContextVar("guardrail_trace_start", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that refresh gauges right before each scrape"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "guardrail_stage_seconds", "Time spent in each inference stage", ["stage"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "guardrail_request_duration_seconds", "End-to-end request latency", ["path"]
+)
+REQUESTS = REGISTRY.counter(
+    "guardrail_requests_total", "Requests by path and HTTP status", ["path", "status"]
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "guardrail_requests_in_flight", "Requests currently being handled", ["path"]
+)
+REQUEST_BODY_BYTES = REGISTRY.histogram(
+    "guardrail_request_body_bytes", "Request body size of POST requests", ["path"],
+    buckets=(1024, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456)
+)
+ERRORS = REGISTRY.counter(
+    "guardrail_request_errors_total", "Rejected requests / batch records by endpoint and cause", ["path", "cause"]
+)
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "guardrail_model_inference_seconds", "Forward pass time per micro-batch", ["model"]
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "guardrail_model_batch_size", "Samples per micro-batch forward pass", ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "guardrail_model_load_seconds", "How long each model took to load", ["model"]
+)
+MODEL_READY = REGISTRY.gauge(
+    "guardrail_model_ready", "1 once a model is loaded, 0 otherwise", ["model"]
+)
+WS_CONNECTIONS = REGISTRY.gauge(
+    "guardrail_ws_connections", "Open /ws sensor streams"
+)
+WS_FRAMES = REGISTRY.counter(
+    "guardrail_ws_frames_total", "Frames received on /ws sensor streams by kind", ["kind"]
+)
+
+CASCADE_SKIPPED = REGISTRY.counter(
+    "guardrail_cascade_skipped_total", "Modality stages skipped by cascade fusion once the risk band was decided", ["stage"]
+)
+
+SEQUENCE_SEGMENTS = REGISTRY.gauge(
+    "guardrail_sequence_segments", "Track segments with a buffered LSTM window"
+)
+FANIN_OPEN_WINDOWS = REGISTRY.gauge(
+    "guardrail_fanin_open_windows", "Fan-in windows waiting for more modality events"
+)
+FANIN_WINDOWS = REGISTRY.gauge(
+    "guardrail_fanin_windows", "Fan-in windows fused since startup by trigger (complete, deadline, overflow, evicted)", ["trigger"]
+)
+FANIN_LATE_EVENTS = REGISTRY.gauge(
+    "guardrail_fanin_late_events", "Fan-in events dropped since startup because their window was already fused"
+)
+ARCHIVE_PENDING = REGISTRY.gauge(
+    "guardrail_archive_pending", "Scored records waiting for the archive writer"
+)
+ARCHIVE_ROWS = REGISTRY.gauge(
+    "guardrail_archive_rows", "Archive rows since startup by outcome (written, dropped, failed)", ["outcome"]
+)
+
+
+# ========================
+# Stage timing
+# ========================
+@contextmanager
+def stage(name):
+    """Time a block into guardrail_stage_seconds and the current request's breakdown"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _trace.get()
+    if trace is not None:
+        trace[name] = trace.get(name, 0.0) + seconds
+
+
+def start_trace():
+    """Begin collecting stage times for the current request (context-local)"""
+    trace = {}
+    _trace.set(trace)
+    _trace_start.set(time.perf_counter())
+    return trace
+
+
+def record_since_request_start(name):
+    """Record the time since the request arrived as a stage (e.g. form parsing before the handler)"""
+    start = _trace_start.get()
+    if start is not None:
+        record_stage(name, time.perf_counter() - start)
+
+
+def current_trace():
+    return _trace.get()
+
+
+def trace_breakdown(trace) -> dict:
+    """A request's accumulated stage times in milliseconds"""
+    return {name: round(seconds * 1000, 3) for name, seconds in trace.items()}
+
+
+def count_error(path, cause):
+    ERRORS.inc(path=path, cause=cause)
+
+
+# ========================
+# ASGI middleware
+# ========================
+class MetricsMiddleware:
+    """
+    Request count / latency / in-flight metrics per route, plus a fresh stage
+    trace for every request. `paths` limits the path label to known routes.
+    """
+
+    def __init__(self, app, paths=None):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if self.paths is not None and path not in self.paths:
+            path = "other"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start_trace()
+        start = time.perf_counter()
+        IN_FLIGHT.inc(path=path)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec(path=path)
+            REQUESTS.inc(path=path, status=status["code"])
+            REQUEST_SECONDS.observe(time.perf_counter() - start, path=path)
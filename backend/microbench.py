@@ -0,0 +1,230 @@
+"""
+microbench.py
+Microbenchmarks for the per-modality hot paths, compared against a saved baseline.
+
+Each case is timed like timeit: the call count is calibrated so one repeat
+takes at least --min-time seconds, then the best and median per-call times
+over --repeat repeats are reported. `--check` fails (exit 1) when a case's
+best time is more than --tolerance slower than the baseline, or when the run
+and the baseline do not cover the same cases (a new or renamed case: save the
+baseline again).
+
+Timings only compare on the same machine, so the baseline is not committed:
+keep it as backend/microbench_baseline.json (git-ignored), saved on the
+machine that runs --check.
+
+Usage:
+    python microbench.py --save-baseline microbench_baseline.json
+    python microbench.py --check microbench_baseline.json
+    python microbench.py --groups vibration parse --json results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+import soundfile as sf
+
+from ingest import parse_csv
+from vibration_features import VibrationFeatureExtractor
+
+GROUPS = ("vibration", "parse", "mel", "rf", "keras")
+
+
+# ========================
+# Cases
+# ========================
+def vibration_cases(rng):
+    extractor = VibrationFeatureExtractor()
+    for n in (100, 1_000, 10_000, 100_000):
+        window = rng.normal(0.15, 0.05, n)
+        yield f"vibration.extract[n={n}]", lambda w=window: extractor.extract(w)
+    windows = rng.normal(0.15, 0.05, (1000, 150))
+    yield "vibration.extract_batch[1000x150]", lambda: extractor.extract_batch(windows)
+
+
+def parse_cases(rng):
+    # The CSV text get_vibration_score receives from the form field
+    for n in (150, 10_000):
+        text = ",".join(f"{x:.6f}" for x in rng.normal(0.15, 0.05, n))
+        yield f"parse.csv[n={n}]", lambda t=text: parse_csv(t)
+
+
+def wav_bytes(rng, sr, seconds):
+    t = np.arange(int(sr * seconds)) / sr
+    audio = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(len(t))
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sr, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def mel_cases(rng):
+    import main
+    from spectrogram import StreamingMelFrontend
+
+    for sr in (8000, 16000, 44100, 48000):
+        for seconds in (1, 5, 10):
+            clip = wav_bytes(rng, sr, seconds)
+            yield f"mel.extract_mel[sr={sr},s={seconds}]", lambda c=clip: main.extract_mel(c)
+    # One 1 s hop of a /ws audio stream whose rolling spectrogram is already full
+    for sr in (16000, 44100):
+        stream = StreamingMelFrontend(main.mel_frontend, sr, score_hop_seconds=1.0)
+        stream.extend(rng.normal(0, 0.1, 5 * sr))
+        hop = rng.normal(0, 0.1, sr)
+        yield f"mel.streaming_hop[sr={sr},s=1]", lambda s=stream, h=hop: s.extend(h)
+
+
+def rf_cases(rng):
+    import main
+
+    import joblib
+    from forest_compiler import load_compiled
+
+    vib = main.registry.get("vibration")
+    rf_path = main.model_path("railway_anomaly_detector.pkl")
+    rf, compiled = joblib.load(rf_path), load_compiled(rf_path)
+    for batch in (1, 1000):
+        features = vib.vib_scaler.transform(rng.normal(0, 1, (batch, main.VIB_FEATURE_COUNT)))
+        yield f"rf.predict_proba[batch={batch}]", lambda x=features: rf.predict_proba(x)
+        yield f"rf.compiled[batch={batch}]", lambda x=features: compiled.predict_proba(x)
+
+
+def keras_cases(rng):
+    import main
+
+    for name, build, weights, shape in (
+        ("acoustic", main.build_acoustic_model, "acoustic_tool_detector.h5", main.MEL_SHAPE + (1,)),
+        ("lstm", main.build_lstm_model, "lstm_sequence_predictor.h5", (main.LSTM_WINDOW, 1)),
+    ):
+        model = build()
+        model.load_weights(main.model_path(weights))
+        for batch in (1, 32):
+            x = rng.normal(0, 1, (batch,) + shape).astype(np.float32)
+            model.predict(x, verbose=0)
+            model(x, training=False)
+            yield f"keras.{name}.predict[batch={batch}]", lambda m=model, x=x: m.predict(x, batch_size=len(x), verbose=0)
+            yield f"keras.{name}.call[batch={batch}]", lambda m=model, x=x: m(x, training=False)
+
+
+CASES = {
+    "vibration": vibration_cases,
+    "parse": parse_cases,
+    "mel": mel_cases,
+    "rf": rf_cases,
+    "keras": keras_cases,
+}
+
+
+# ========================
+# Timing
+# ========================
+def measure(fn, repeat, min_time):
+    """Best and median seconds per call, timeit-style"""
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2 if number < 8 else 4
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "best_us": round(min(runs) * 1e6, 2),
+        "median_us": round(float(np.median(runs)) * 1e6, 2),
+        "number": number,
+        "repeat": repeat
+    }
+
+
+def run(groups, repeat, min_time, match=None):
+    results = {}
+    for group in groups:
+        rng = np.random.default_rng(42)
+        for name, fn in CASES[group](rng):
+            if not selected(name, groups, match):
+                continue
+            results[name] = measure(fn, repeat, min_time)
+            print(f"  {name:<44} {results[name]['best_us']:>12.1f} µs", file=sys.stderr)
+    return results
+
+
+def selected(name, groups, match=None):
+    """Whether a run with these --groups / --match includes the case `name`"""
+    return name.split(".", 1)[0] in groups and (not match or match in name)
+
+
+def compare(results, baseline, tolerance, groups=GROUPS, match=None):
+    """
+    Check a run against a baseline
+
+    Returns:
+        (regressions, missing, extra): cases whose best time regressed by more than
+        `tolerance` (a fraction), cases run without a baseline time, and baseline
+        cases in the selected groups that were not run
+    """
+    base_results = baseline.get("results", {})
+    regressions, missing = [], []
+    for name, result in results.items():
+        base = base_results.get(name)
+        if base is None:
+            missing.append(name)
+            continue
+        ratio = result["best_us"] / base["best_us"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, base["best_us"], result["best_us"], ratio))
+    extra = [name for name in base_results if name not in results and selected(name, groups, match)]
+    return regressions, missing, extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the inference hot paths")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--match", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per repeat")
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as the new baseline")
+    parser.add_argument("--check", metavar="PATH", help="compare against this baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": run(args.groups, args.repeat, args.min_time, args.match)
+    }
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+            print(f"✓ Wrote {path}", file=sys.stderr)
+
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        regressions, missing, extra = compare(report["results"], baseline, args.tolerance, args.groups, args.match)
+        for name, before, after, ratio in regressions:
+            print(f"❌ {name}: {before:.1f} µs -> {after:.1f} µs ({ratio:.2f}x)", file=sys.stderr)
+        for name in missing:
+            print(f"❌ {name}: not in the baseline (new or renamed case - save the baseline again)", file=sys.stderr)
+        for name in extra:
+            print(f"❌ {name}: in the baseline but not run (removed or renamed case)", file=sys.stderr)
+        if regressions or missing or extra:
+            sys.exit(1)
+        print(f"✓ No regressions beyond {args.tolerance:.0%} against {args.check}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+model_registry.py
+Tracks the inference models and their load state.
+Models are registered with a loader function and loaded in a background
+thread (or lazily on first use), so the API starts serving /health right away
+and reports readiness per model on /ready.
+"""
+
+import threading
+import time
+import traceback
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+class ModelNotReady(RuntimeError):
+    """Raised when a request needs a model that is not (yet) loaded"""
+
+
+class _Entry:
+    def __init__(self, loader, enabled):
+        self.loader = loader
+        self.state = PENDING if enabled else DISABLED
+        self.model = None
+        self.error = None
+        self.load_seconds = None
+        self.reloading = False
+        self.loaded = threading.Event()
+
+
+class ModelRegistry:
+    """
+    Named models with per-model load state
+
+    Each model moves pending -> loading -> ready (or failed). Disabled models
+    are never loaded and do not count against readiness.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, enabled=True):
+        """Register a loader; `loader()` returns the loaded model object"""
+        self._entries[name] = _Entry(loader, enabled)
+
+    def get(self, name, wait=0.0):
+        """
+        Return a loaded model
+
+        A pending model is loaded inline (lazy loading). A model another thread is
+        loading is waited on for up to `wait` seconds. Raises ModelNotReady otherwise.
+        """
+        entry = self._entries[name]
+        if entry.state == READY:
+            return entry.model
+        if entry.state == DISABLED:
+            raise ModelNotReady(f"Model '{name}' is disabled in this deployment")
+        if entry.state == FAILED:
+            raise ModelNotReady(f"Model '{name}' failed to load: {entry.error}")
+
+        if self._claim(name):
+            self._load(name)
+        elif wait:
+            entry.loaded.wait(wait)
+
+        if entry.state != READY:
+            raise ModelNotReady(f"Model '{name}' is {entry.state}")
+        return entry.model
+
+    def load(self, name):
+        """Load one model now unless it is already loading or loaded"""
+        if self._claim(name):
+            self._load(name)
+
+    def reload(self, name):
+        """
+        Load a loaded (or failed) model again, e.g. after its files were replaced
+
+        The new model is swapped in only once it has loaded; requests keep using
+        the old one until then, and keep it if the reload fails (the error is raised).
+        """
+        entry = self._entries[name]
+        with self._lock:
+            if entry.state == DISABLED:
+                raise ModelNotReady(f"Model '{name}' is disabled in this deployment")
+            if entry.state in (PENDING, LOADING) or entry.reloading:
+                raise ModelNotReady(f"Model '{name}' is {'reloading' if entry.reloading else entry.state}")
+            entry.reloading = True
+        start = time.perf_counter()
+        try:
+            model = entry.loader()
+        finally:
+            entry.reloading = False
+        entry.model, entry.state, entry.error = model, READY, None
+        entry.load_seconds = round(time.perf_counter() - start, 3)
+        entry.loaded.set()
+
+    def load_all(self):
+        """Load every pending model, one after another"""
+        for name in list(self._entries):
+            self.load(name)
+
+    def load_all_in_background(self):
+        """Start load_all() on a daemon thread and return immediately"""
+        thread = threading.Thread(target=self.load_all, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def is_enabled(self, name):
+        return self._entries[name].state != DISABLED
+
+    def is_ready(self):
+        """True when every enabled model is loaded"""
+        return all(e.state in (READY, DISABLED) for e in self._entries.values())
+
+    def status(self):
+        """Per-model state, load time and error, for /health and /ready"""
+        return {
+            name: {
+                "state": e.state,
+                "load_seconds": e.load_seconds,
+                "error": e.error
+            }
+            for name, e in self._entries.items()
+        }
+
+    def _claim(self, name):
+        with self._lock:
+            entry = self._entries[name]
+            if entry.state != PENDING:
+                return False
+            entry.state = LOADING
+            return True
+
+    def _load(self, name):
+        entry = self._entries[name]
+        start = time.perf_counter()
+        try:
+            entry.model = entry.loader()
+            entry.state = READY
+        except Exception as e:
+            entry.error = str(e)
+            entry.state = FAILED
+            print(f"❌ Loading model '{name}' failed: {e}")
+            traceback.print_exc()
+        finally:
+            entry.load_seconds = round(time.perf_counter() - start, 3)
+            entry.loaded.set()
@@ -0,0 +1,220 @@
+"""
+rescore.py
+Offline re-scoring of the sensor archive after a model update.
+
+Reads the archived raw inputs (see sensor_archive.py), splits every
+sensor-day chunk into shards of --shard-size rows and scores them on a
+process pool. Each worker loads the models once, then extracts vibration
+features, mel spectrograms and LSTM windows a whole shard at a time and runs
+batched forward passes. Scores go to a columnar output that mirrors the
+archive layout row for row:
+
+    <output>/<sensor_id>/<YYYY-MM-DD>/{vibration,acoustic,temporal,intent}_score.f4
+
+Finished shards are appended to <output>/checkpoint.log, so re-running the
+same command resumes where an interrupted run stopped.
+
+Usage:
+    python rescore.py --archive /data/guardrail-archive --output /data/rescored --workers 8
+    python rescore.py --archive /data/guardrail-archive --output /data/rescored-rf --models vibration
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import quote
+
+import numpy as np
+
+from fusion import weighted_sum
+from sensor_archive import SensorArchive
+
+MODELS = ("vibration", "acoustic", "temporal")
+OUTPUT_COLUMNS = ("vibration_score", "acoustic_score", "temporal_score", "intent_score")
+OUTPUT_DTYPE = np.dtype("<f4")
+
+_worker = {}
+
+
+# ========================
+# Worker
+# ========================
+def init_worker(models, threads):
+    """Load the models this run re-scores, once per worker process"""
+    import main
+
+    if {"acoustic", "temporal"} & set(models) and main.settings.inference_backend == "keras" and threads:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    for name in models:
+        main.registry.get("lstm" if name == "temporal" else name)
+    _worker["main"] = main
+
+
+def score_shard(archive_root, sensor_id, day, start, stop, output_dir, models, batch_size):
+    """Re-score rows start..stop of one chunk into the output columns; returns the row count"""
+    main = _worker["main"]
+    chunk = SensorArchive(archive_root).chunk(sensor_id, day)
+    scores = {name: np.array(chunk.column(f"{name}_score")[start:stop], dtype=np.float64) for name in MODELS}
+
+    if "vibration" in models:
+        # Same minimum as parse_vibration; shorter windows keep their archived score
+        rows, windows = _rows_with_samples(chunk, "vibration", start, stop, min_length=100)
+        if rows:
+            vib = main.registry.get("vibration")
+            scores["vibration"][rows] = main.score_vibration_features(vib.feature_extractor.extract_ragged(windows))
+
+    if "acoustic" in models:
+        rows, clips = _rows_with_samples(chunk, "audio", start, stop)
+        model = main.registry.get("acoustic") if rows else None
+        for i in range(0, len(rows), batch_size):
+            mels = main.mel_frontend.transform([np.asarray(c, dtype=np.float64) for c in clips[i:i + batch_size]])
+            outputs = model.predict(np.stack(mels)[..., np.newaxis].astype(np.float32))
+            scores["acoustic"][rows[i:i + batch_size]] = outputs[:, 0]
+
+    if "temporal" in models:
+        rows, seqs = _rows_with_samples(chunk, "sequence", start, stop, length=main.LSTM_WINDOW)
+        model = main.registry.get("lstm") if rows else None
+        for i in range(0, len(rows), batch_size):
+            batch = [np.asarray(s, dtype=np.float64) for s in seqs[i:i + batch_size]]
+            preds = model.predict(np.stack(batch)[..., np.newaxis].astype(np.float32))[:, 0]
+            scores["temporal"][rows[i:i + batch_size]] = main.unplanned_probability(preds, batch)
+
+    # Only the re-scored models change: the human score (PIR or the vision
+    # confidence) and the context score are the archived ones
+    for name in ("human", "context"):
+        scores[name] = np.array(chunk.column(f"{name}_score")[start:stop], dtype=np.float64)
+    # Stages skipped by cascade fusion were archived as NaN: fuse them as unknown
+    known = lambda score: None if np.isnan(score) else float(score)
+    intent = np.array([
+        weighted_sum({name: known(values[i]) for name, values in scores.items()})
+        for i in range(stop - start)
+    ])
+
+    for name, values in zip(OUTPUT_COLUMNS, (scores["vibration"], scores["acoustic"], scores["temporal"], intent)):
+        column = np.memmap(os.path.join(output_dir, f"{name}.f4"), dtype=OUTPUT_DTYPE, mode="r+")
+        column[start:stop] = values
+        column.flush()
+        del column
+    return stop - start
+
+
+def _rows_with_samples(chunk, name, start, stop, min_length=1, length=None):
+    """Shard-relative indices and sample views of the rows that archived a usable input"""
+    rows, samples = [], []
+    for i, values in enumerate(chunk.rows(name, start, stop)):
+        if len(values) >= min_length and (length is None or len(values) == length):
+            rows.append(i)
+            samples.append(values)
+    return rows, samples
+
+
+# ========================
+# Coordinator
+# ========================
+def prepare_output(output_dir, n_rows):
+    """Create (or grow, if the chunk gained rows) the output columns of one chunk"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name in OUTPUT_COLUMNS:
+        path = os.path.join(output_dir, f"{name}.f4")
+        size = n_rows * OUTPUT_DTYPE.itemsize
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            with open(path, "ab"):
+                pass
+            os.truncate(path, size)
+
+
+def load_checkpoint(path) -> set:
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue   # a line cut short by an interrupted run
+                done.add((entry["sensor_id"], entry["day"], entry["start"], entry["stop"]))
+    return done
+
+
+def plan_shards(archive, output, shard_size, sensors=None, start_day=None, end_day=None):
+    shards = []
+    for sensor_id, day, chunk in archive.scan(sensors, start_day, end_day):
+        n_rows = len(chunk)
+        if n_rows == 0:
+            continue
+        output_dir = os.path.join(output, quote(sensor_id, safe=""), day)
+        prepare_output(output_dir, n_rows)
+        for start in range(0, n_rows, shard_size):
+            shards.append((sensor_id, day, start, min(start + shard_size, n_rows), output_dir))
+    return shards
+
+
+def run(args):
+    archive = SensorArchive(args.archive)
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint_path = os.path.join(args.output, "checkpoint.log")
+    done = load_checkpoint(checkpoint_path)
+
+    shards = plan_shards(archive, args.output, args.shard_size, args.sensors, args.start_day, args.end_day)
+    pending = [s for s in shards if s[:4] not in done]
+    print(f"✓ {len(shards)} shards, {len(shards) - len(pending)} already done", file=sys.stderr)
+
+    rows = 0
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=init_worker,
+                             initargs=(args.models, args.threads_per_worker)) as pool, \
+            open(checkpoint_path, "a") as checkpoint:
+        futures = {
+            pool.submit(score_shard, args.archive, sensor_id, day, lo, hi, output_dir, args.models, args.batch_size):
+                (sensor_id, day, lo, hi)
+            for sensor_id, day, lo, hi, output_dir in pending
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            sensor_id, day, lo, hi = futures[future]
+            rows += future.result()
+            checkpoint.write(json.dumps({"sensor_id": sensor_id, "day": day, "start": lo, "stop": hi}) + "\n")
+            checkpoint.flush()
+            elapsed = time.perf_counter() - start
+            print(f"  {i}/{len(pending)} shards  {rows} rows  {rows / elapsed:.1f} rows/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "archive": args.archive,
+        "output": args.output,
+        "models": args.models,
+        "workers": args.workers,
+        "shards": len(shards),
+        "shards_skipped": len(shards) - len(pending),
+        "rows": rows,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 2) if rows else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score archived sensor data with the current models")
+    parser.add_argument("--archive", required=True, help="sensor archive directory (GUARDRAIL_ARCHIVE_DIR)")
+    parser.add_argument("--output", required=True, help="directory for the re-scored columns and checkpoint")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS),
+                        help="scores to recompute; the others are copied from the archive")
+    parser.add_argument("--sensors", nargs="+", help="only these sensor IDs")
+    parser.add_argument("--start-day", help="first UTC day (YYYY-MM-DD)")
+    parser.add_argument("--end-day", help="last UTC day (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="TensorFlow threads per worker")
+    parser.add_argument("--shard-size", type=int, default=512, help="rows per task")
+    parser.add_argument("--batch-size", type=int, default=64, help="samples per CNN/LSTM forward pass")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
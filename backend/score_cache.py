@@ -0,0 +1,135 @@
+"""
+score_cache.py
+Content-addressed cache of per-modality scores.
+Gateways often re-post the same clip or vibration window (retries, sensors
+that have not changed). Scores are cached under a hash of the raw payload, in
+a bounded LRU with a TTL. Reloading a model (POST /models/{name}/reload)
+drops the entries of its modality, so no score from the old model is served.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+DIGEST_CHUNK_BYTES = 1 << 20
+
+
+def payload_digest(payload) -> bytes:
+    """128-bit BLAKE2b of a payload: bytes, text, an array (dtype and shape included) or a binary file"""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(payload, np.ndarray):
+        h.update(f"{payload.dtype.str}{payload.shape}".encode())
+        h.update(np.ascontiguousarray(payload).data)
+    elif isinstance(payload, str):
+        h.update(b"str:")
+        h.update(payload.encode())
+    elif hasattr(payload, "read"):
+        # Same digest as the file's bytes, read a chunk at a time (then rewound)
+        h.update(b"bytes:")
+        payload.seek(0)
+        for chunk in iter(lambda: payload.read(DIGEST_CHUNK_BYTES), b""):
+            h.update(chunk)
+        payload.seek(0)
+    else:
+        h.update(b"bytes:")
+        h.update(payload)
+    return h.digest()
+
+
+class ScoreCache:
+    """
+    LRU + TTL map from (modality, payload hash) to score
+
+    Args:
+        max_entries: entries kept across all modalities (0 disables the cache)
+        ttl_seconds: how long a score stays valid (<= 0: until evicted)
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get_or_compute(self, modality, payload, compute):
+        """Cached score for `payload`, or compute(payload) and cache it (errors are not cached)"""
+        if not self.enabled:
+            return compute(payload)
+        key = (modality, payload_digest(payload))
+        score = self.get(key)
+        if score is None:
+            score = compute(payload)
+            self.put(key, score)
+        return score
+
+    def get(self, key):
+        modality = key[0]
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[1] is not None and item[1] <= now:
+                del self._entries[key]
+                self._count(modality, "expired")
+                item = None
+            if item is None:
+                self._count(modality, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(modality, "hits")
+            return item[0]
+
+    def put(self, key, score):
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (score, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._count(evicted[0], "evicted")
+
+    def invalidate(self, modality=None):
+        """Drop the entries of one modality, or of all of them"""
+        with self._lock:
+            stale = [k for k in self._entries if modality is None or k[0] == modality]
+            for key in stale:
+                del self._entries[key]
+            for name in ([modality] if modality else list(self._counters)):
+                self._count(name, "invalidations")
+        return len(stale)
+
+    def stats(self):
+        """Hit/miss counters per modality plus overall size, for /cache/stats"""
+        with self._lock:
+            per_modality = {}
+            for modality, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                per_modality[modality] = dict(
+                    counters,
+                    entries=sum(1 for k in self._entries if k[0] == modality),
+                    hit_rate=round(counters["hits"] / lookups, 4) if lookups else None
+                )
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "modalities": per_modality
+            }
+
+    def _count(self, modality, counter):
+        # Callers hold self._lock
+        counters = self._counters.get(modality)
+        if counters is None:
+            counters = self._counters[modality] = {
+                "hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidations": 0
+            }
+        counters[counter] += 1
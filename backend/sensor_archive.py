@@ -0,0 +1,324 @@
+"""
+sensor_archive.py
+Append-only columnar archive of scored windows and their raw inputs.
+One row per scored window (per /predict/intent record), chunked into a
+directory per sensor and UTC day. Every column is a flat little-endian file,
+so readers memory-map it and slice months of data as zero-copy NumPy views
+instead of querying sensor_readings row by row.
+
+Layout:
+    <root>/<sensor_id>/<YYYY-MM-DD>/
+        schema.json          column dtypes and the audio sample rate
+        timestamp.f8         unix seconds; written last, so it sets the row count
+        <score>.f4           one float32 per row (vibration_score, ...)
+        pir.u1, weather_ignore.u1
+        <samples>.f4         every row's samples back to back (vibration, sequence, audio)
+        <samples>_end.i8     end offset of each row's samples in <samples>.f4
+"""
+
+import datetime
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+FORMAT_VERSION = 1
+ROW_COLUMNS = {
+    "vibration_score": np.dtype("<f4"),
+    "acoustic_score": np.dtype("<f4"),
+    "temporal_score": np.dtype("<f4"),
+    "human_score": np.dtype("<f4"),
+    "context_score": np.dtype("<f4"),
+    "intent_score": np.dtype("<f4"),
+    "pir": np.dtype("u1"),
+    "weather_ignore": np.dtype("u1"),
+}
+SAMPLE_COLUMNS = ("vibration", "sequence", "audio")
+SAMPLE_DTYPE = np.dtype("<f4")
+OFFSET_DTYPE = np.dtype("<i8")
+TIMESTAMP_DTYPE = np.dtype("<f8")
+# Sensor IDs name the chunk directories: no separators, and never "." or ".."
+SENSOR_ID_PATTERN = re.compile(r"[A-Za-z0-9_:-][A-Za-z0-9._:-]{0,127}")
+DAY_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+_STOP = object()
+
+
+def _suffix(dtype) -> str:
+    return f"{dtype.kind}{dtype.itemsize}"
+
+
+def column_files() -> dict:
+    """File name -> dtype of every column file in a chunk"""
+    files = {f"{name}.{_suffix(SAMPLE_DTYPE)}": SAMPLE_DTYPE for name in SAMPLE_COLUMNS}
+    files.update({f"{name}_end.{_suffix(OFFSET_DTYPE)}": OFFSET_DTYPE for name in SAMPLE_COLUMNS})
+    files.update({f"{name}.{_suffix(dtype)}": dtype for name, dtype in ROW_COLUMNS.items()})
+    files[f"timestamp.{_suffix(TIMESTAMP_DTYPE)}"] = TIMESTAMP_DTYPE
+    return files
+
+
+def check_sensor_id(sensor_id) -> str:
+    """The sensor ID as a string; ValueError unless it is safe as a directory name"""
+    sensor_id = str(sensor_id)
+    if not SENSOR_ID_PATTERN.fullmatch(sensor_id):
+        raise ValueError(f"Invalid sensor_id '{sensor_id}': use up to 128 letters, digits, "
+                         "'.', '_', ':' or '-', not starting with '.'")
+    return sensor_id
+
+
+def day_of(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def _map(path, dtype, count=None):
+    """Read-only memmap of a column file (an empty array for a missing/empty one)"""
+    size = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    if count is not None:
+        size = min(size, count)
+    if size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(size,))
+
+
+class ArchiveChunk:
+    """Memory-mapped view of one sensor-day; rows past the last complete one are ignored"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "schema.json")) as f:
+            self.schema = json.load(f)
+        self.timestamp = _map(self._file("timestamp", TIMESTAMP_DTYPE), TIMESTAMP_DTYPE)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def column(self, name) -> np.ndarray:
+        """A per-row column (timestamp, scores, pir, weather_ignore)"""
+        if name == "timestamp":
+            return self.timestamp
+        if name not in ROW_COLUMNS:
+            raise KeyError(f"Unknown column '{name}'")
+        if name not in self._columns:
+            self._columns[name] = _map(self._file(name, ROW_COLUMNS[name]), ROW_COLUMNS[name], len(self))
+        return self._columns[name]
+
+    def ends(self, name) -> np.ndarray:
+        """End offset of each row's samples in samples(name)"""
+        key = name + "_end"
+        if key not in self._columns:
+            if name not in SAMPLE_COLUMNS:
+                raise KeyError(f"Unknown sample column '{name}'")
+            self._columns[key] = _map(self._file(key, OFFSET_DTYPE), OFFSET_DTYPE, len(self))
+        return self._columns[key]
+
+    def samples(self, name, row=None) -> np.ndarray:
+        """All samples of a sample column, or one row's"""
+        ends = self.ends(name)
+        total = int(ends[-1]) if len(ends) else 0
+        if name not in self._columns:
+            self._columns[name] = _map(self._file(name, SAMPLE_DTYPE), SAMPLE_DTYPE, total)
+        values = self._columns[name]
+        if row is None:
+            return values
+        start = int(ends[row - 1]) if row > 0 else 0
+        return values[start:int(ends[row])]
+
+    def rows(self, name, start=0, stop=None) -> list:
+        """Zero-copy views of the samples of rows start..stop"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        return [self.samples(name, row) for row in range(start, stop)]
+
+    def _file(self, name, dtype):
+        return os.path.join(self.path, f"{name}.{_suffix(dtype)}")
+
+
+class _ChunkWriter:
+    """Open append handles for one sensor-day"""
+
+    def __init__(self, path, audio_sample_rate):
+        os.makedirs(path, exist_ok=True)
+        schema_path = os.path.join(path, "schema.json")
+        if not os.path.exists(schema_path):
+            with open(schema_path, "w") as f:
+                json.dump({
+                    "version": FORMAT_VERSION,
+                    "audio_sample_rate": audio_sample_rate,
+                    "columns": {name: dtype.str for name, dtype in column_files().items()}
+                }, f, indent=2)
+        self._repair(path)
+        self.files = {name: open(os.path.join(path, name), "ab") for name in column_files()}
+        self.ends = {}
+        for name in SAMPLE_COLUMNS:
+            self.ends[name] = os.path.getsize(os.path.join(path, f"{name}.{_suffix(SAMPLE_DTYPE)}")) // SAMPLE_DTYPE.itemsize
+
+    @staticmethod
+    def _repair(path):
+        """Truncate columns written past the last complete row (e.g. after a crash mid-append)"""
+        files = column_files()
+        sizes = {name: os.path.getsize(os.path.join(path, name)) if os.path.exists(os.path.join(path, name)) else 0
+                 for name in files}
+        n = sizes[f"timestamp.{_suffix(TIMESTAMP_DTYPE)}"] // TIMESTAMP_DTYPE.itemsize
+        target = {name: n * dtype.itemsize for name, dtype in files.items()}
+        for name in SAMPLE_COLUMNS:
+            ends = _map(os.path.join(path, f"{name}_end.{_suffix(OFFSET_DTYPE)}"), OFFSET_DTYPE, n)
+            target[f"{name}.{_suffix(SAMPLE_DTYPE)}"] = (int(ends[-1]) if n else 0) * SAMPLE_DTYPE.itemsize
+            del ends
+        for name, size in sizes.items():
+            if size > target[name]:
+                os.truncate(os.path.join(path, name), target[name])
+
+    def append(self, timestamp, scalars, samples):
+        # Samples and offsets first, timestamp last: a row only counts once all of it is on disk
+        for name in SAMPLE_COLUMNS:
+            values = np.asarray(samples.get(name, ()), dtype=SAMPLE_DTYPE).ravel()
+            self.files[f"{name}.{_suffix(SAMPLE_DTYPE)}"].write(values.tobytes())
+            self.ends[name] += len(values)
+            self.files[f"{name}_end.{_suffix(OFFSET_DTYPE)}"].write(np.array([self.ends[name]], dtype=OFFSET_DTYPE).tobytes())
+        for name, dtype in ROW_COLUMNS.items():
+            self.files[f"{name}.{_suffix(dtype)}"].write(np.array([scalars.get(name, 0)], dtype=dtype).tobytes())
+        timestamp_file = self.files[f"timestamp.{_suffix(TIMESTAMP_DTYPE)}"]
+        for f in self.files.values():
+            if f is not timestamp_file:
+                f.flush()
+        timestamp_file.write(np.array([timestamp], dtype=TIMESTAMP_DTYPE).tobytes())
+        timestamp_file.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+class SensorArchive:
+    """
+    Sensor-day chunks under `root`
+
+    Args:
+        root: archive directory
+        audio_sample_rate: rate of the archived audio samples (recorded per chunk)
+        max_open: chunks kept open for appending at once
+    """
+
+    def __init__(self, root, audio_sample_rate=16000, max_open=64):
+        self.root = root
+        self.audio_sample_rate = audio_sample_rate
+        self.max_open = max(1, int(max_open))
+        self._writers = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def append(self, sensor_id, scalars: dict, samples: dict, timestamp=None):
+        """
+        Add one row to the sensor's chunk for the timestamp's UTC day
+
+        Args:
+            scalars: values for ROW_COLUMNS (missing ones are stored as 0)
+            samples: 1-D arrays for SAMPLE_COLUMNS (missing ones as empty)
+        """
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        key = (str(sensor_id), day_of(timestamp))
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is None:
+                while len(self._writers) >= self.max_open:
+                    self._writers.popitem(last=False)[1].close()
+                writer = self._writers[key] = _ChunkWriter(self._chunk_path(*key), self.audio_sample_rate)
+            else:
+                self._writers.move_to_end(key)
+            writer.append(timestamp, scalars, samples)
+
+    def sensors(self) -> list:
+        return sorted(unquote(name) for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def days(self, sensor_id) -> list:
+        path = os.path.join(self.root, quote(check_sensor_id(sensor_id), safe=""))
+        if not os.path.isdir(path):
+            return []
+        return sorted(d for d in os.listdir(path) if os.path.exists(os.path.join(path, d, "schema.json")))
+
+    def chunk(self, sensor_id, day) -> ArchiveChunk:
+        return ArchiveChunk(self._chunk_path(str(sensor_id), day))
+
+    def scan(self, sensors=None, start_day=None, end_day=None):
+        """(sensor_id, day, ArchiveChunk) for every chunk in range (days as YYYY-MM-DD, inclusive)"""
+        for sensor_id in (self.sensors() if sensors is None else sensors):
+            for day in self.days(sensor_id):
+                if (start_day and day < start_day) or (end_day and day > end_day):
+                    continue
+                yield sensor_id, day, self.chunk(sensor_id, day)
+
+    def close(self):
+        with self._lock:
+            while self._writers:
+                self._writers.popitem()[1].close()
+
+    def _chunk_path(self, sensor_id, day):
+        if not DAY_PATTERN.fullmatch(str(day)):
+            raise ValueError(f"Invalid archive day '{day}', expected YYYY-MM-DD")
+        path = os.path.join(self.root, quote(check_sensor_id(sensor_id), safe=""), day)
+        root = os.path.realpath(self.root)
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            raise ValueError(f"Archive chunk {path} is outside {self.root}")
+        return path
+
+
+class ArchiveWriter:
+    """
+    Background thread that builds and appends archive rows off the request path
+
+    submit() never blocks: when more than max_pending rows are waiting, the
+    row is dropped and counted instead of slowing the API down.
+    """
+
+    def __init__(self, archive: SensorArchive, max_pending=1000, name="archive-writer"):
+        self.archive = archive
+        self._queue = queue.Queue(maxsize=max(1, int(max_pending)))
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, build_fn, *args) -> bool:
+        """Queue build_fn(*args) -> (sensor_id, scalars, samples, timestamp); False if dropped"""
+        try:
+            self._queue.put_nowait((build_fn, args))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "root": self.archive.root,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+    def close(self, timeout=10):
+        """Write what is still queued, then stop"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        self.archive.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            build_fn, args = item
+            try:
+                self.archive.append(*build_fn(*args))
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Archive write failed: {e}")
@@ -0,0 +1,153 @@
+"""
+sequence_buffers.py
+Server-side sequence windows per track segment.
+Instead of re-sending all 60 LSTM values on every call, a client names its
+track segment (or sensor) and sends only the samples recorded since its last
+call. The store keeps the latest window per segment in a bounded LRU with an
+idle timeout, so memory stays flat however many segments report in.
+
+Clients that number their samples (first_index: the stream position of the
+first new sample) can retry safely: samples the segment already holds are
+skipped. Callers preview() the window a request would see and only append()
+once the request has been scored, so a failed request leaves no trace.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SegmentWindow:
+    """The most recent `window` samples of one segment"""
+
+    __slots__ = ("values", "count", "next_index", "last_seen")
+
+    def __init__(self, window):
+        self.values = np.zeros(window)
+        self.count = 0
+        self.next_index = 0         # stream position of the next sample
+        self.last_seen = time.monotonic()
+
+    def copy(self):
+        segment = SegmentWindow(len(self.values))
+        segment.values[:] = self.values
+        segment.count, segment.next_index = self.count, self.next_index
+        return segment
+
+    def extend(self, samples: np.ndarray, first_index=None):
+        """Append the samples not held yet (all of them without first_index)"""
+        if first_index is not None:
+            held = self.next_index - int(first_index)
+            if held > 0:
+                samples = samples[held:]
+            else:
+                # A gap (lost samples) or the first numbered call: continue from here
+                self.next_index = int(first_index)
+        self.append(samples)
+        self.next_index += len(samples)
+
+    def append(self, samples: np.ndarray):
+        window = len(self.values)
+        n = len(samples)
+        if n >= window:
+            self.values[:] = samples[-window:]
+        elif n:
+            self.values[:-n] = self.values[n:]
+            self.values[-n:] = samples
+        self.count = min(window, self.count + n)
+        self.last_seen = time.monotonic()
+
+    @property
+    def full(self):
+        return self.count == len(self.values)
+
+
+class SequenceBufferStore:
+    """
+    LRU of per-segment sequence windows
+
+    Args:
+        window: samples per window (the LSTM input length)
+        max_segments: segments kept; the least recently updated one is dropped
+            when a new segment arrives at the limit (0 disables the store)
+        ttl_seconds: segments idle for longer than this start over empty
+            (<= 0: kept until evicted)
+    """
+
+    def __init__(self, window=60, max_segments=10000, ttl_seconds=3600.0):
+        self.window = int(window)
+        self.max_segments = max(0, int(max_segments))
+        self.ttl = ttl_seconds
+        self._segments = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_segments > 0
+
+    def append(self, segment_id, samples, first_index=None):
+        """
+        Add new samples to a segment
+
+        Args:
+            first_index: stream position of samples[0]; already held samples are skipped
+
+        Returns:
+            (window, count): a copy of the segment's latest `window` samples once
+            it holds that many (None before), and how many samples it holds
+        """
+        return self._update(segment_id, samples, first_index, commit=True)
+
+    def preview(self, segment_id, samples, first_index=None):
+        """(window, count) append() would return, leaving the segment unchanged"""
+        return self._update(segment_id, samples, first_index, commit=False)
+
+    def _update(self, segment_id, samples, first_index, commit):
+        if not self.enabled:
+            raise ValueError("Sequence buffers are disabled (GUARDRAIL_SEQUENCE_BUFFER_MAX_SEGMENTS=0)")
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        if not np.all(np.isfinite(samples)):
+            raise ValueError("Sequence samples must be finite")
+        segment_id = str(segment_id)
+
+        with self._lock:
+            segment = self._segments.get(segment_id)
+            if segment is not None and self._expired(segment):
+                if commit:
+                    del self._segments[segment_id]
+                    self._expirations += 1
+                segment = None
+            if not commit:
+                segment = segment.copy() if segment is not None else SegmentWindow(self.window)
+            elif segment is None:
+                while len(self._segments) >= self.max_segments:
+                    self._segments.popitem(last=False)
+                    self._evictions += 1
+                segment = self._segments[segment_id] = SegmentWindow(self.window)
+            else:
+                self._segments.move_to_end(segment_id)
+            segment.extend(samples, first_index)
+            return (segment.values.copy() if segment.full else None), segment.count
+
+    def reset(self, segment_id) -> bool:
+        """Forget a segment's samples; False if it was not buffered"""
+        with self._lock:
+            return self._segments.pop(str(segment_id), None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "max_segments": self.max_segments,
+                "window": self.window,
+                "ttl_seconds": self.ttl,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+    def _expired(self, segment):
+        return self.ttl > 0 and time.monotonic() - segment.last_seen > self.ttl
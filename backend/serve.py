@@ -0,0 +1,65 @@
+"""
+serve.py
+Run the model server with several worker processes sharing one copy of the
+model weights.
+
+The parent loads the model artifacts once and writes their memory-mappable
+forms (see shared_weights.py) to a shared directory, on /dev/shm by default
+so the pages live in RAM. It then starts the uvicorn workers with
+GUARDRAIL_SHARED_WEIGHTS_DIR pointing at it. The parent itself never imports
+TensorFlow; each worker maps the forest, the scaler and (with
+GUARDRAIL_INFERENCE_BACKEND=tflite) the CNN/LSTM exports.
+
+Usage:
+    python serve.py --workers 4
+    GUARDRAIL_INFERENCE_BACKEND=tflite python serve.py --workers 8 --port 8000
+    # Other process managers (gunicorn): prepare once, then start them with
+    # GUARDRAIL_SHARED_WEIGHTS_DIR=/dev/shm/guardrail-weights
+    python serve.py --prepare-only --shared-dir /dev/shm/guardrail-weights
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import uvicorn
+
+import shared_weights
+from config import settings
+
+
+def default_shared_dir() -> str:
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(root, f"guardrail-weights-{os.getpid()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve main:app from several workers sharing the model weights")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="uvicorn worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shared-dir", help="directory for the prepared weights (default: a new one on /dev/shm)")
+    parser.add_argument("--prepare-only", action="store_true", help="write the shared directory and exit")
+    args = parser.parse_args()
+
+    shared_dir = args.shared_dir or default_shared_dir()
+    manifest = shared_weights.prepare(settings.models_dir, shared_dir, settings.inference_backend)
+    total = sum(f["bytes"] for f in manifest["files"].values())
+    print(f"✓ Prepared {len(manifest['files'])} shared artifacts in {shared_dir} ({total / 1e6:.1f} MB)", file=sys.stderr)
+    if args.prepare_only:
+        print(json.dumps(manifest, indent=2))
+        return
+
+    os.environ["GUARDRAIL_SHARED_WEIGHTS_DIR"] = shared_dir
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        if not args.shared_dir:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+shared_weights.py
+Model artifacts prepared once and memory-mapped by every worker process.
+A parent (serve.py) loads the models directory once and writes the
+read-only weights to a shared directory in forms workers can map instead of
+deserializing into private memory:
+
+    railway_anomaly_detector.forest   compiled RF node arrays (forest_compiler.py)
+    scaler.joblib                     uncompressed joblib dump; mean_/scale_ are mapped
+    feature_extractor.pkl             stateless, copied as-is
+    <model>.tflite                    CNN/LSTM exports, mapped by the TFLite interpreter
+    manifest.json                     what was written and from where
+
+Mapped pages of the same file are shared by all processes, so each extra
+worker costs its interpreter state and request memory, not another copy of
+the weights. Keras models own their variables and cannot map weights, so the
+CNN and LSTM are only shared with GUARDRAIL_INFERENCE_BACKEND=tflite.
+"""
+
+import json
+import os
+import shutil
+import time
+
+FOREST_FILE = "railway_anomaly_detector.forest"
+SCALER_FILE = "scaler.joblib"
+EXTRACTOR_FILE = "feature_extractor.pkl"
+MANIFEST_FILE = "manifest.json"
+RF_SOURCE = "railway_anomaly_detector.pkl"
+SCALER_SOURCE = "scaler.pkl"
+EXPORT_STEMS = ("acoustic_tool_detector", "lstm_sequence_predictor")
+
+
+def prepare(models_dir: str, shared_dir: str, inference_backend="keras") -> dict:
+    """Load the artifacts of models_dir once and write their mappable forms to shared_dir"""
+    import joblib
+
+    from forest_compiler import file_sha256, load_compiled, save_forest
+
+    os.makedirs(shared_dir, exist_ok=True)
+    sources = {}
+
+    rf_path = os.path.join(models_dir, RF_SOURCE)
+    if os.path.exists(rf_path):
+        save_forest(load_compiled(rf_path), os.path.join(shared_dir, FOREST_FILE))
+        sources[FOREST_FILE] = rf_path
+    scaler_path = os.path.join(models_dir, SCALER_SOURCE)
+    if os.path.exists(scaler_path):
+        # No compression, so joblib.load(mmap_mode="r") maps the arrays in place
+        joblib.dump(joblib.load(scaler_path), os.path.join(shared_dir, SCALER_FILE), compress=0)
+        sources[SCALER_FILE] = scaler_path
+    extractor_path = os.path.join(models_dir, EXTRACTOR_FILE)
+    if os.path.exists(extractor_path):
+        shutil.copyfile(extractor_path, os.path.join(shared_dir, EXTRACTOR_FILE))
+        sources[EXTRACTOR_FILE] = extractor_path
+
+    if inference_backend == "tflite":
+        for stem in EXPORT_STEMS:
+            path = os.path.join(models_dir, stem + ".tflite")
+            if os.path.exists(path):
+                shutil.copyfile(path, os.path.join(shared_dir, stem + ".tflite"))
+                sources[stem + ".tflite"] = path
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "models_dir": os.path.abspath(models_dir),
+        "inference_backend": inference_backend,
+        "files": {
+            name: {"source": source, "bytes": os.path.getsize(os.path.join(shared_dir, name)),
+                   "sha256": file_sha256(source)}
+            for name, source in sources.items()
+        }
+    }
+    with open(os.path.join(shared_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def shared_file(shared_dir: str, name: str):
+    """Path of a prepared artifact, or None when the directory does not hold it"""
+    path = os.path.join(shared_dir, name)
+    return path if os.path.exists(path) else None
+
+
+def load_vibration(shared_dir: str) -> tuple:
+    """(forest, scaler, feature extractor) mapped from a prepared directory"""
+    import joblib
+
+    from forest_compiler import load_forest
+
+    for name in (FOREST_FILE, SCALER_FILE, EXTRACTOR_FILE):
+        if shared_file(shared_dir, name) is None:
+            raise FileNotFoundError(f"{os.path.join(shared_dir, name)} not found - prepare the directory with serve.py")
+    return (
+        load_forest(os.path.join(shared_dir, FOREST_FILE)),
+        joblib.load(os.path.join(shared_dir, SCALER_FILE), mmap_mode="r"),
+        joblib.load(os.path.join(shared_dir, EXTRACTOR_FILE))
+    )
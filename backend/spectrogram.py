@@ -0,0 +1,278 @@
+"""
+spectrogram.py
+Mel-spectrogram front end for the acoustic CNN.
+Reproduces the training-time librosa pipeline (soxr_hq resample, centered
+Hann STFT, Slaney mel filterbank, power_to_db with ref=np.max and top_db=80)
+in plain NumPy, but builds the filterbank and window once, keeps a soxr
+resampler per input sample rate, and runs several clips through a single
+FFT and filterbank product. StreamingMelFrontend does the same for a
+continuous audio stream, one STFT hop at a time.
+"""
+
+import io
+import threading
+
+import numpy as np
+import soundfile as sf
+
+AMIN = 1e-10
+# Frames decoded per block when downmixing, so a long stereo upload never
+# exists in memory as a whole (channels x frames) float64 array
+DECODE_BLOCK_FRAMES = 65536
+TOP_DB = 80.0
+# Extra source samples decoded past the last needed one, so the resampler's
+# filter sees the same input as it would for the whole clip
+RESAMPLE_MARGIN = 1024
+REF_SCOPES = ("clip", "window")
+
+
+def hz_to_mel(frequencies):
+    """Slaney mel scale (librosa's default, htk=False)"""
+    frequencies = np.asanyarray(frequencies, dtype=np.float64)
+    f_sp = 200.0 / 3
+    mels = frequencies / f_sp
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    log_t = frequencies >= min_log_hz
+    mels = np.where(log_t, min_log_mel + np.log(np.maximum(frequencies, min_log_hz) / min_log_hz) / logstep, mels)
+    return mels
+
+
+def mel_to_hz(mels):
+    mels = np.asanyarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    freqs = f_sp * mels
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    log_t = mels >= min_log_mel
+    freqs[log_t] = min_log_hz * np.exp(logstep * (mels[log_t] - min_log_mel))
+    return freqs
+
+
+def mel_filterbank(sr: int, n_fft: int, n_mels: int) -> np.ndarray:
+    """Slaney-normalized triangular filters, shape (n_mels, 1 + n_fft // 2), as librosa.filters.mel"""
+    weights = np.zeros((n_mels, 1 + n_fft // 2), dtype=np.float32)
+    fftfreqs = np.fft.rfftfreq(n=n_fft, d=1.0 / sr)
+    mel_f = mel_to_hz(np.linspace(hz_to_mel(0.0), hz_to_mel(sr / 2.0), n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fftfreqs)
+    for i in range(n_mels):
+        lower = -ramps[i] / fdiff[i]
+        upper = ramps[i + 2] / fdiff[i + 1]
+        weights[i] = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_f[2:n_mels + 2] - mel_f[:n_mels]))[:, np.newaxis]
+    return weights
+
+
+def hann_window(n_fft: int) -> np.ndarray:
+    """Periodic Hann window (scipy.signal.get_window('hann', n_fft))"""
+    return 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n_fft) / n_fft)
+
+
+def audio_file(source):
+    """A seekable binary file for encoded audio given as bytes or as a file (e.g. a spooled upload)"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def decode_audio(source, max_frames: int = -1):
+    """
+    Decode a WAV (or any libsndfile format) to mono float64, optionally only its first max_frames
+
+    `source` is bytes or a binary file; it is read block by block and
+    downmixed into one preallocated mono array.
+    """
+    with sf.SoundFile(audio_file(source)) as f:
+        frames = f.frames if max_frames < 0 else min(max_frames, f.frames)
+        if f.channels == 1:
+            return f.read(frames, dtype="float64"), f.samplerate
+        audio = np.empty(frames)
+        pos = 0
+        for block in f.blocks(blocksize=DECODE_BLOCK_FRAMES, frames=frames, dtype="float64", always_2d=True):
+            audio[pos:pos + len(block)] = np.mean(block, axis=1)
+            pos += len(block)
+        return audio[:pos], f.samplerate
+
+
+class MelFrontend:
+    """
+    Audio bytes -> (n_mels, n_frames) dB mel spectrogram, padded/cropped like extract_mel
+
+    Args:
+        sr: model sample rate; other rates are resampled with soxr (soxr_hq)
+        n_fft, hop_length, n_mels: STFT / filterbank parameters used in training
+        n_frames: frames kept for the model input
+        ref_scope: "clip" normalizes to the loudest frame of the whole clip,
+                   exactly like power_to_db(ref=np.max) over the full clip;
+                   "window" only decodes and transforms the samples behind the
+                   kept frames and normalizes to the loudest of those
+                   (identical for clips no longer than the window)
+    """
+
+    def __init__(self, sr=16000, n_fft=1024, hop_length=512, n_mels=64, n_frames=128, ref_scope="clip"):
+        if ref_scope not in REF_SCOPES:
+            raise ValueError(f"Unsupported mel ref scope '{ref_scope}', expected one of {', '.join(REF_SCOPES)}")
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.n_frames = n_frames
+        self.ref_scope = ref_scope
+        self.window = hann_window(n_fft)
+        self.mel_basis = mel_filterbank(sr, n_fft, n_mels).astype(np.float64)
+        # Samples at self.sr behind the first n_frames centered frames
+        self.window_samples = (n_frames - 1) * hop_length + n_fft // 2
+        # soxr streams are stateful, so each scorer thread keeps its own per input rate
+        self._local = threading.local()
+
+    def load(self, source) -> np.ndarray:
+        """Decode (bytes or a binary file) and resample one clip to self.sr (only the needed head in "window" scope)"""
+        audio, sr = self.decode(source)
+        return self.conform(audio, sr)
+
+    def decode(self, source):
+        """Mono samples and their sample rate; in "window" scope only as many as the kept frames need"""
+        max_frames = -1
+        if self.ref_scope == "window":
+            info = sf.info(audio_file(source))
+            max_frames = int(np.ceil(self.window_samples * info.samplerate / self.sr)) + RESAMPLE_MARGIN
+        return decode_audio(source, max_frames)
+
+    def conform(self, audio: np.ndarray, sr: int) -> np.ndarray:
+        """Resample decoded samples to self.sr (and crop them to the window in "window" scope)"""
+        if sr != self.sr:
+            audio = self.resample(audio, sr)
+        if self.ref_scope == "window":
+            audio = audio[:self.window_samples]
+        return audio
+
+    def resample(self, audio: np.ndarray, orig_sr: int) -> np.ndarray:
+        """soxr_hq resample to self.sr, trimmed/padded to ceil(len * ratio) like librosa.resample"""
+        import soxr
+
+        streams = getattr(self._local, "streams", None)
+        if streams is None:
+            streams = self._local.streams = {}
+        stream = streams.get(orig_sr)
+        if stream is None:
+            stream = streams[orig_sr] = soxr.ResampleStream(orig_sr, self.sr, 1, dtype="float64", quality="soxr_hq")
+        else:
+            stream.clear()
+
+        resampled = stream.resample_chunk(np.ascontiguousarray(audio, dtype=np.float64), last=True)
+        n_samples = int(np.ceil(len(audio) * float(self.sr) / orig_sr))
+        if len(resampled) < n_samples:
+            resampled = np.pad(resampled, (0, n_samples - len(resampled)))
+        return resampled[:n_samples]
+
+    def mel_db(self, source) -> np.ndarray:
+        return self.transform([self.load(source)])[0]
+
+    def transform(self, signals: list) -> list:
+        """Mel dB spectrograms for several clips at self.sr, from one FFT over all their frames"""
+        frames, counts = [], []
+        for audio in signals:
+            padded = np.pad(audio, self.n_fft // 2)
+            n = 1 + (len(padded) - self.n_fft) // self.hop_length
+            if self.ref_scope == "window":
+                n = min(n, self.n_frames)
+            frames.append(np.lib.stride_tricks.sliding_window_view(padded, self.n_fft)[::self.hop_length][:n])
+            counts.append(n)
+
+        spectrum = np.fft.rfft(np.concatenate(frames) * self.window, axis=-1)
+        power = np.abs(spectrum) ** 2
+        mel = power @ self.mel_basis.T
+
+        out, start = [], 0
+        for n in counts:
+            out.append(self._to_db(mel[start:start + n].T))
+            start += n
+        return out
+
+    def _to_db(self, mel: np.ndarray) -> np.ndarray:
+        # power_to_db(ref=np.max, amin=1e-10, top_db=80.0) over the computed frames
+        log_spec = 10.0 * np.log10(np.maximum(AMIN, mel))
+        log_spec -= 10.0 * np.log10(np.maximum(AMIN, mel.max()))
+        log_spec = np.maximum(log_spec, log_spec.max() - TOP_DB)
+        if log_spec.shape[1] < self.n_frames:
+            return np.pad(log_spec, ((0, 0), (0, self.n_frames - log_spec.shape[1])))
+        return log_spec[:, :self.n_frames]
+
+
+class StreamingMelFrontend:
+    """
+    Rolling (n_mels, n_frames) dB mel spectrogram of a continuous audio stream
+
+    Keeps the STFT state of one stream (a resampler and the samples the next
+    frame still needs) plus the mel power of the last n_frames frames, so each
+    new hop_length samples cost one FFT frame instead of a whole clip.
+
+    The stream is framed like one endless centered STFT: frame t is centered
+    on sample t * hop_length, and only the very first frames see zero padding.
+    power_to_db(ref=np.max) is taken over the frames in the rolling matrix
+    (the "window" ref scope), so the first matrix equals MelFrontend's output
+    for the stream's first clip in "window" scope.
+
+    Args:
+        frontend: MelFrontend whose parameters, window and filterbank are used
+        input_sr: sample rate of the incoming samples (resampled with soxr if not frontend.sr)
+        score_hop_seconds: how often a new matrix is emitted once the first one is full
+    """
+
+    def __init__(self, frontend: MelFrontend, input_sr: int, score_hop_seconds: float = 1.0):
+        if score_hop_seconds <= 0:
+            raise ValueError("score_hop_seconds must be positive")
+        self.frontend = frontend
+        self.input_sr = int(input_sr)
+        self.hop_frames = max(1, int(round(score_hop_seconds * frontend.sr / frontend.hop_length)))
+        self.reset()
+
+    def reset(self):
+        self._resampler = None
+        if self.input_sr != self.frontend.sr:
+            import soxr
+            self._resampler = soxr.ResampleStream(
+                self.input_sr, self.frontend.sr, 1, dtype="float64", quality="soxr_hq"
+            )
+        # Samples not yet covered by a whole frame, starting with the centering pad
+        self._pending = np.zeros(self.frontend.n_fft // 2)
+        self._history = np.empty((0, self.frontend.n_mels))
+        self._frames = 0
+
+    def extend(self, samples) -> list:
+        """
+        Add samples at input_sr
+
+        Returns:
+            a (n_mels, n_frames) dB matrix for every score hop the samples
+            completed, oldest first (none until n_frames frames exist)
+        """
+        fe = self.frontend
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples)
+        buffer = np.concatenate([self._pending, samples])
+        n_new = 0 if len(buffer) < fe.n_fft else 1 + (len(buffer) - fe.n_fft) // fe.hop_length
+        if n_new == 0:
+            self._pending = buffer
+            return []
+
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, fe.n_fft)[::fe.hop_length][:n_new]
+        power = np.abs(np.fft.rfft(frames * fe.window, axis=-1)) ** 2
+        mel = np.concatenate([self._history, power @ fe.mel_basis.T])
+        self._pending = buffer[n_new * fe.hop_length:]
+
+        # Matrices end after frames n_frames + k * hop_frames (1-based) of the stream
+        previous = self._frames
+        self._frames += n_new
+        start = previous - (len(mel) - n_new)   # stream frame index of mel[0]
+        k = max(0, -(-(previous + 1 - fe.n_frames) // self.hop_frames))
+        ends = range(fe.n_frames + k * self.hop_frames, self._frames + 1, self.hop_frames)
+        out = [fe._to_db(mel[end - start - fe.n_frames:end - start].T) for end in ends]
+
+        self._history = mel[-fe.n_frames:]
+        return out
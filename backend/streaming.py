@@ -0,0 +1,164 @@
+"""
+streaming.py
+Per-connection state for the /ws sensor stream.
+A sensor post keeps one WebSocket open and sends binary frames, each tagged
+with its channel in the first byte (vibration samples, PCM audio or sequence
+samples). SensorStream buffers every channel in a rolling window and hands
+back the windows that filled up, so the existing scorers only run when there
+is something new to score. Audio goes through an incremental STFT, so
+overlapping clips never recompute the frames they share.
+"""
+
+import numpy as np
+
+from spectrogram import StreamingMelFrontend
+from vibration_features import StreamingVibrationFeatureExtractor
+
+CHANNEL_VIBRATION = 0x01
+CHANNEL_AUDIO = 0x02
+CHANNEL_SEQUENCE = 0x03
+CHANNELS = {
+    CHANNEL_VIBRATION: "vibration",
+    CHANNEL_AUDIO: "audio",
+    CHANNEL_SEQUENCE: "sequence",
+}
+
+SAMPLE_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+}
+# PCM_16 is scaled to [-1, 1) the way soundfile reads 16-bit WAV files
+AUDIO_DTYPES = {
+    "int16": (np.dtype("<i2"), 1 / 32768.0),
+    "float32": (np.dtype("<f4"), 1.0),
+}
+
+
+class RollingWindow:
+    """
+    The most recent `window` samples of a stream, emitted every `hop` samples
+
+    extend() returns a copy of every window completed by the new samples, oldest
+    first; the first one is emitted as soon as `window` samples have arrived.
+    """
+
+    def __init__(self, window, hop=None):
+        if window < 1:
+            raise ValueError("Window must hold at least 1 sample")
+        self.window = int(window)
+        self.hop = max(1, int(hop or window))
+        self._buffer = np.empty(0)
+        self._seen = 0
+
+    def extend(self, values) -> list:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return []
+        combined = np.concatenate([self._buffer, values])
+        previous = self._seen
+        start = previous - len(self._buffer)   # stream index of combined[0]
+        self._seen += len(values)
+
+        # Windows end (exclusively) at stream positions window + k * hop; emit the
+        # ones that fall inside the samples just added
+        k = max(0, -(-(previous + 1 - self.window) // self.hop))
+        ends = range(self.window + k * self.hop, self._seen + 1, self.hop)
+        windows = [combined[end - start - self.window:end - start].copy() for end in ends]
+
+        self._buffer = combined[-self.window:]
+        return windows
+
+    def reset(self):
+        self._buffer = np.empty(0)
+        self._seen = 0
+
+
+class SensorStream:
+    """
+    Rolling buffers for one connected sensor post
+
+    Args:
+        mel_frontend: MelFrontend of the acoustic CNN; audio is turned into its
+            rolling mel spectrogram hop by hop
+        vibration_window / vibration_hop: samples per vibration feature window and
+            between consecutive windows (features are updated incrementally)
+        audio_sample_rate: rate of the PCM audio samples
+        audio_hop_seconds: how often the rolling mel spectrogram is scored
+        sequence_window / sequence_hop: samples per LSTM window
+        vibration_dtype / sequence_dtype: float32 or float64 little-endian samples
+        audio_dtype: int16 (PCM_16) or float32 samples
+    """
+
+    def __init__(self, mel_frontend, sensor_id=None, vibration_window=150, vibration_hop=None,
+                 audio_sample_rate=16000, audio_hop_seconds=1.0,
+                 sequence_window=60, sequence_hop=None,
+                 vibration_dtype="float32", audio_dtype="int16", sequence_dtype="float32",
+                 pir=0, weather_ignore=False):
+        self.mel_frontend = mel_frontend
+        self.sensor_id = sensor_id
+        self.pir = pir
+        self.weather_ignore = weather_ignore
+        self.configure(
+            vibration_window=vibration_window, vibration_hop=vibration_hop,
+            audio_sample_rate=audio_sample_rate, audio_hop_seconds=audio_hop_seconds,
+            sequence_window=sequence_window, sequence_hop=sequence_hop,
+            vibration_dtype=vibration_dtype, audio_dtype=audio_dtype, sequence_dtype=sequence_dtype
+        )
+
+    def configure(self, vibration_window=150, vibration_hop=None,
+                  audio_sample_rate=16000, audio_hop_seconds=1.0,
+                  sequence_window=60, sequence_hop=None,
+                  vibration_dtype="float32", audio_dtype="int16", sequence_dtype="float32"):
+        """(Re)build the buffers; anything already buffered is dropped"""
+        for name, value, allowed in (("vibration_dtype", vibration_dtype, SAMPLE_DTYPES),
+                                     ("audio_dtype", audio_dtype, AUDIO_DTYPES),
+                                     ("sequence_dtype", sequence_dtype, SAMPLE_DTYPES)):
+            if value not in allowed:
+                raise ValueError(f"Unsupported {name} '{value}', expected one of {', '.join(allowed)}")
+        if vibration_window < 100:
+            raise ValueError("vibration_window must be at least 100 samples")
+        if audio_sample_rate <= 0 or audio_hop_seconds <= 0:
+            raise ValueError("audio_sample_rate and audio_hop_seconds must be positive")
+
+        self.vibration_dtype = SAMPLE_DTYPES[vibration_dtype]
+        self.audio_dtype, self.audio_scale = AUDIO_DTYPES[audio_dtype]
+        self.sequence_dtype = SAMPLE_DTYPES[sequence_dtype]
+        self.audio_sample_rate = int(audio_sample_rate)
+
+        self.vibration = StreamingVibrationFeatureExtractor(
+            window=vibration_window, hop=vibration_hop or vibration_window
+        )
+        self.audio = StreamingMelFrontend(self.mel_frontend, self.audio_sample_rate, audio_hop_seconds)
+        self.sequence = RollingWindow(sequence_window, sequence_hop)
+
+    def feed(self, frame: bytes) -> dict:
+        """
+        Decode one tagged binary frame
+
+        Returns:
+            {"vibration": (n, 20) feature rows} or {"audio": [mel dB matrices]} or
+            {"sequence": [windows]}, holding whatever windows the frame completed
+        """
+        if len(frame) < 1 or frame[0] not in CHANNELS:
+            raise ValueError("Binary frames must start with a channel byte: 1 vibration, 2 audio, 3 sequence")
+        channel, payload = frame[0], memoryview(frame)[1:]
+
+        if channel == CHANNEL_VIBRATION:
+            samples = self._samples(payload, self.vibration_dtype, "vibration")
+            return {"vibration": self.vibration.extend(samples)}
+        if channel == CHANNEL_AUDIO:
+            samples = self._samples(payload, self.audio_dtype, "audio")
+            if self.audio_scale != 1.0:
+                samples = samples * self.audio_scale
+            return {"audio": self.audio.extend(samples)}
+        samples = self._samples(payload, self.sequence_dtype, "sequence")
+        return {"sequence": self.sequence.extend(samples)}
+
+    @staticmethod
+    def _samples(payload, dtype, name):
+        if len(payload) % dtype.itemsize:
+            raise ValueError(f"{name} frame of {len(payload)} bytes is not a whole number of {dtype.itemsize}-byte samples")
+        samples = np.frombuffer(payload, dtype=dtype)
+        if not np.all(np.isfinite(samples)):
+            raise ValueError(f"{name} frame contains non-finite samples")
+        return samples
@@ -0,0 +1,199 @@
+"""
+uploads.py
+Request body limits for the prediction endpoints.
+UploadLimitMiddleware rejects an oversized request with 413 from its
+Content-Length alone, before a byte of the body is read, and stops requests
+without one (chunked uploads) as soon as they cross the limit. Multipart
+parts (uploads and text fields) have their own limits, enforced while the
+body streams in, so an oversized part is cut off before Starlette has
+spooled or buffered the rest of it; multipart files are spooled to disk
+past 1 MiB, so neither holds the body in memory.
+"""
+
+import json
+
+from fastapi import HTTPException
+from multipart.multipart import parse_options_header
+
+import metrics
+
+
+class PayloadTooLarge(HTTPException):
+    """413; an HTTPException so FastAPI passes it through form parsing unchanged"""
+
+    def __init__(self, detail):
+        super().__init__(status_code=413, detail=detail)
+
+
+def check_size(name: str, size, limit: int):
+    if limit > 0 and size is not None and size > limit:
+        raise PayloadTooLarge(f"{name} is {size} bytes, the limit is {limit} bytes")
+
+
+def check_upload(name: str, upload, limit: int):
+    """Reject an UploadFile larger than `limit` bytes (0: unlimited)"""
+    if upload is not None:
+        check_size(name, upload.size, limit)
+
+
+class PartSizeCounter:
+    """
+    Counts the bytes of each multipart part as the body streams past
+
+    Raises PayloadTooLarge as soon as a part crosses the limit of its field
+    name. Only the part delimiters and headers are looked at (bytes.find, no
+    Python loop over the data), so Starlette's parser still does the real
+    parsing and rejects malformed bodies.
+    """
+
+    MAX_HEADER_BYTES = 16 * 1024
+
+    def __init__(self, boundary: bytes, limits: dict):
+        self.limits = limits
+        self.delimiter = b"\r\n--" + boundary
+        self.field = None
+        self.limit = 0
+        self.size = 0
+        self._pending = b"\r\n"      # the first delimiter has no CRLF before it
+        self._in_part = False         # counting a part's data (not the preamble)
+        self._in_headers = False
+        self._done = False
+
+    @classmethod
+    def for_request(cls, scope, limits: dict):
+        """A counter for a multipart request, or None for any other body"""
+        if not limits:
+            return None
+        for key, value in scope["headers"]:
+            if key == b"content-type":
+                content_type, params = parse_options_header(value)
+                if content_type == b"multipart/form-data" and params.get(b"boundary"):
+                    return cls(params[b"boundary"], limits)
+                return None
+        return None
+
+    def feed(self, chunk: bytes):
+        """Count a body chunk"""
+        if self._done:
+            return
+        data = self._pending + chunk
+        pos = 0
+        while True:
+            if self._in_headers:
+                if len(data) - pos < 2:
+                    break
+                if data.startswith(b"--", pos):   # closing delimiter
+                    self._done = True
+                    self._pending = b""
+                    return
+                end = data.find(b"\r\n\r\n", pos)
+                if end < 0:
+                    if len(data) - pos > self.MAX_HEADER_BYTES:
+                        self._done = True     # not a body we understand; leave it to Starlette
+                        self._pending = b""
+                        return
+                    break
+                self._start_part(data[pos:end])
+                pos = end + 4
+                continue
+            found = data.find(self.delimiter, pos)
+            if found < 0:
+                # Keep a tail that could be the start of a delimiter split across chunks
+                keep = max(pos, len(data) - len(self.delimiter) + 1)
+                self._count(keep - pos)
+                pos = keep
+                break
+            self._count(found - pos)
+            pos = found + len(self.delimiter)
+            self._in_part, self._in_headers = False, True
+        self._pending = data[pos:]
+
+    def _start_part(self, headers: bytes):
+        self.field, self.limit, self.size = None, 0, 0
+        for line in headers.split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-disposition":
+                _, options = parse_options_header(value.strip())
+                self.field = options.get(b"name", b"").decode("utf-8", "replace")
+                self.limit = self.limits.get(self.field, 0)
+        self._in_part, self._in_headers = True, False
+
+    def _count(self, n: int):
+        if not self._in_part:
+            return
+        self.size += n
+        if self.limit > 0 and self.size > self.limit:
+            raise PayloadTooLarge(f"{self.field} exceeds the limit of {self.limit} bytes")
+
+
+class UploadLimitMiddleware:
+    """
+    Per-request body size limit for POST requests, and per-part limits for multipart bodies
+
+    Args:
+        limits: {path: max body bytes}; other paths use default_limit
+        default_limit: limit for every other path (0: unlimited)
+        part_limits: {form field name: max bytes of that multipart part (0: unlimited)}
+    """
+
+    def __init__(self, app, limits=None, default_limit=0, part_limits=None):
+        self.app = app
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.part_limits = part_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        limit = self.limits.get(path, self.default_limit)
+        label = path if path in self.limits else "other"
+        content_length = None
+        for key, value in scope["headers"]:
+            if key == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
+                break
+
+        if limit > 0 and content_length is not None and content_length > limit:
+            metrics.count_error(label, "payload_too_large")
+            await self._reject(send, f"Request body is {content_length} bytes, the limit is {limit} bytes")
+            return
+
+        received = 0
+        parts = PartSizeCounter.for_request(scope, self.part_limits)
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if limit > 0 and received > limit:
+                    metrics.count_error(label, "payload_too_large")
+                    raise PayloadTooLarge(f"Request body exceeds the limit of {limit} bytes")
+                if parts is not None and body:
+                    try:
+                        parts.feed(body)
+                    except PayloadTooLarge:
+                        metrics.count_error(label, "payload_too_large")
+                        raise
+                if not message.get("more_body", False):
+                    metrics.REQUEST_BODY_BYTES.observe(received, path=label)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send, detail):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
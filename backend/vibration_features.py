@@ -72,9 +72,33 @@ vibration_features.py
 Place this file in the same directory as main.py
 """
 
+import bisect
+import math
+import threading
+from collections import deque
+
 import numpy as np
 
 
+def _sorted_percentile(at, n, q):
+    """
+    Linear-interpolated percentile from order statistics, using the same
+    arithmetic as np.percentile so results are bit-identical.
+    `at(i)` returns the i-th smallest value (or a column of them).
+    """
+    virtual_index = (n - 1) * q
+    if virtual_index >= n - 1:
+        return at(-1)
+    below = int(math.floor(virtual_index))
+    gamma = virtual_index - below
+    a = at(below)
+    b = at(below + 1)
+    diff_b_a = b - a
+    if gamma >= 0.5:
+        return b - diff_b_a * (1 - gamma)
+    return a + diff_b_a * gamma
+
+
 class VibrationFeatureExtractor:
     """
     Feature extractor for vibration signal analysis
@@ -136,4 +160,427 @@ class VibrationFeatureExtractor:
         # Length (1)
         features.append(len(vibration_array))               # 20. Signal length
         
-        return np.array(features)
\ No newline at end of file
+        return np.array(features)
+
+    def extract_batch(self, windows, out=None):
+        """
+        Extract the same 20 features for many equal-length windows at once
+
+        Intermediate results are shared across features: one sort serves the
+        median and percentiles, one squared array serves energy and RMS, the
+        variance gives the standard deviation, and one diff serves the three
+        derivative features. Each row is bit-identical to extract() on that
+        window, so the trained scaler and forest apply unchanged.
+
+        Args:
+            windows: 2-D array (n_windows, window_length) of vibration values
+            out: optional float64 array (n_windows, 20) to write the features into
+
+        Returns:
+            numpy array of shape (n_windows, 20)
+        """
+        x = np.ascontiguousarray(windows, dtype=np.float64)
+        if x.ndim != 2:
+            raise ValueError(f"Expected a 2-D array of windows, got shape {x.shape}")
+        n_windows, n = x.shape
+        features = np.empty((n_windows, 20)) if out is None else out
+        if n_windows == 0:
+            return features
+
+        # Time domain features
+        mean = np.mean(x, axis=1)
+        var = np.var(x, axis=1)
+        std = np.sqrt(var)
+        x_max = np.max(x, axis=1)
+        x_min = np.min(x, axis=1)
+        if not (np.all(np.isfinite(x_min)) and np.all(np.isfinite(x_max))):
+            # np.histogram in extract() rejects these windows too
+            raise ValueError("autodetected range of vibration window is not finite")
+
+        ordered = np.sort(x, axis=1)
+        mid = n // 2
+        if n % 2:
+            median = ordered[:, mid]
+        else:
+            median = (ordered[:, mid - 1] + ordered[:, mid]) / 2
+
+        features[:, 0] = mean
+        features[:, 1] = std
+        features[:, 2] = x_max
+        features[:, 3] = x_min
+        features[:, 4] = median
+        features[:, 5] = _sorted_percentile(lambda i: ordered[:, i], n, 0.25)
+        features[:, 6] = _sorted_percentile(lambda i: ordered[:, i], n, 0.75)
+        features[:, 7] = x_max - x_min
+
+        # Statistical moments and energy
+        squared = x ** 2
+        energy = np.sum(squared, axis=1)
+        features[:, 8] = var
+        features[:, 9] = np.mean(np.abs(x), axis=1)
+        features[:, 10] = energy
+        features[:, 11] = np.sqrt(energy / n)
+
+        # Zero crossing rate
+        features[:, 12] = np.count_nonzero(np.diff(np.sign(x), axis=1), axis=1)
+
+        # Peak features
+        threshold = mean + 2 * std
+        peak_mask = x > threshold[:, np.newaxis]
+        peak_counts = np.count_nonzero(peak_mask, axis=1)
+        features[:, 13] = peak_counts
+        features[:, 14] = self._masked_row_means(x, peak_mask, peak_counts)
+
+        # Entropy approximation
+        hist = self._histogram_rows(x, x_min, x_max, bins=10)
+        hist = hist / (np.sum(hist, axis=1, keepdims=True) + 1e-10)
+        features[:, 15] = -np.sum(hist * np.log(hist + 1e-10), axis=1)
+
+        # Derivative features
+        abs_diff = np.abs(np.diff(x, axis=1))
+        total_variation = np.sum(abs_diff, axis=1)
+        features[:, 16] = total_variation
+        features[:, 17] = np.max(abs_diff, axis=1)
+        features[:, 18] = total_variation / (n - 1)
+
+        # Length
+        features[:, 19] = n
+
+        return features
+
+    def extract_ragged(self, windows, out=None):
+        """
+        Extract features for windows of different lengths
+
+        Windows are grouped by length and each group goes through
+        extract_batch(); rows come back in input order.
+
+        Args:
+            windows: sequence of 1-D vibration arrays
+            out: optional float64 array (len(windows), 20) to write the features into
+
+        Returns:
+            numpy array of shape (len(windows), 20)
+        """
+        windows = [np.asarray(w, dtype=np.float64) for w in windows]
+        features = np.empty((len(windows), 20)) if out is None else out
+
+        groups = {}
+        for i, window in enumerate(windows):
+            groups.setdefault(len(window), []).append(i)
+        for indices in groups.values():
+            if len(indices) == 1:
+                batch = windows[indices[0]][np.newaxis]
+            else:
+                batch = np.stack([windows[i] for i in indices])
+            if len(indices) == len(windows):
+                self.extract_batch(batch, out=features)
+            else:
+                features[indices] = self.extract_batch(batch)
+
+        return features
+
+    @staticmethod
+    def _masked_row_means(x, mask, counts):
+        """Mean of the selected values in each row, 0 for rows with no selection"""
+        # Row by row on purpose: segmented sums (np.add.reduceat) use a different
+        # summation order than np.mean and drift by an ULP
+        means = np.zeros(x.shape[0])
+        for row in np.flatnonzero(counts):
+            means[row] = np.mean(x[row][mask[row]])
+        return means
+
+    @staticmethod
+    def _histogram_rows(x, x_min, x_max, bins):
+        """Per-row equal-width histogram counts, binned exactly like np.histogram(row, bins)"""
+        n_windows = x.shape[0]
+        first_edge = x_min.copy()
+        last_edge = x_max.copy()
+        flat = first_edge == last_edge
+        first_edge[flat] -= 0.5
+        last_edge[flat] += 0.5
+
+        edges = np.linspace(first_edge, last_edge, bins + 1, axis=1)
+        f_indices = ((x - first_edge[:, np.newaxis]) / (last_edge - first_edge)[:, np.newaxis]) * bins
+        indices = f_indices.astype(np.intp)
+        indices[indices == bins] -= 1
+
+        # Same off-by-one-ULP corrections np.histogram applies at the bin edges
+        rows = np.arange(n_windows)[:, np.newaxis]
+        decrement = x < edges[rows, indices]
+        indices[decrement] -= 1
+        increment = (x >= edges[rows, indices + 1]) & (indices != bins - 1)
+        indices[increment] += 1
+
+        offsets = indices + rows * bins
+        return np.bincount(offsets.ravel(), minlength=n_windows * bins).reshape(n_windows, bins)
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+class StreamingVibrationFeatureExtractor:
+    """
+    Sliding-window version of VibrationFeatureExtractor for continuous streams
+
+    Samples are pushed one at a time; once the window is full, the same 20
+    features as extract() are produced every `hop` samples without rescanning
+    the window. Running sums cover mean / variance / energy / total variation,
+    zero crossings are counted incrementally, a sorted copy of the window
+    serves min / max / median / percentiles / peaks / histogram, and a
+    monotonic deque tracks the max derivative. Order-statistic features match
+    extract() exactly; sum-based ones match to floating-point rounding.
+
+    The sorted copy is a plain list, so inserting and evicting a sample is a
+    binary search plus an O(window) memmove, and mean_peak sums the samples
+    above the peak threshold. That is linear in the window, not O(log window),
+    but with a small constant: pushes stay around a microsecond at the default
+    150-sample window and tens of microseconds at 100k samples, below the fixed
+    cost of assembling the features each hop.
+    """
+
+    def __init__(self, window=150, hop=1, resync_every=None):
+        """
+        Args:
+            window: number of samples per feature window
+            hop: emit features every `hop` samples once the window is full
+            resync_every: recompute the running sums from scratch after this many
+                          evictions to stop rounding drift (default: once per window)
+        """
+        if window < 2:
+            raise ValueError("Window must hold at least 2 samples")
+        self.window = int(window)
+        self.hop = max(1, int(hop))
+        self.resync_every = int(resync_every or window)
+        self.reset()
+
+    def reset(self):
+        """Forget all buffered samples"""
+        self._samples = deque()
+        self._sorted = []
+        self._max_diffs = deque()   # (sample index, |diff|), decreasing |diff|
+        self._seen = 0
+        self._evictions = 0
+        self._shift = 0.0           # sums of (x - shift) keep the variance well conditioned
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._sum_abs = 0.0
+        self._energy = 0.0
+        self._total_variation = 0.0
+        self._zero_crossings = 0
+
+    @property
+    def ready(self):
+        """True once a full window has been buffered"""
+        return len(self._samples) == self.window
+
+    def push(self, value):
+        """
+        Add one sample
+
+        Returns:
+            numpy array of 20 features when this sample completes a hop, else None
+        """
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"Vibration sample is not finite: {value}")
+
+        if len(self._samples) == self.window:
+            self._evict()
+        self._append(value)
+
+        if self.ready and (self._seen - self.window) % self.hop == 0:
+            return self.features()
+        return None
+
+    def extend(self, values):
+        """
+        Add many samples
+
+        Returns:
+            numpy array (n_hops, 20) with one row per hop completed by these samples
+        """
+        rows = [f for f in (self.push(v) for v in values) if f is not None]
+        return np.array(rows) if rows else np.empty((0, 20))
+
+    def features(self):
+        """Features of the current window (needs at least 2 samples)"""
+        n = len(self._samples)
+        if n < 2:
+            raise ValueError("Not enough samples buffered")
+
+        ordered = self._sorted
+        x_min, x_max = ordered[0], ordered[-1]
+        mean = self._shift + self._sum / n
+        var = max((self._sum_sq - self._sum * self._sum / n) / n, 0.0)
+        std = math.sqrt(var)
+        mid = n // 2
+        median = ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+        threshold = mean + 2 * std
+        first_peak = bisect.bisect_right(ordered, threshold)
+        n_peaks = n - first_peak
+        mean_peak = sum(ordered[first_peak:]) / n_peaks if n_peaks else 0
+
+        hist = np.array(self._histogram(ordered, x_min, x_max, bins=10), dtype=np.float64)
+        hist = hist / (n + 1e-10)
+        entropy = -np.sum(hist * np.log(hist + 1e-10))
+
+        return np.array([
+            mean,
+            std,
+            x_max,
+            x_min,
+            median,
+            _sorted_percentile(ordered.__getitem__, n, 0.25),
+            _sorted_percentile(ordered.__getitem__, n, 0.75),
+            x_max - x_min,
+            var,
+            self._sum_abs / n,
+            self._energy,
+            math.sqrt(self._energy / n),
+            self._zero_crossings,
+            n_peaks,
+            mean_peak,
+            entropy,
+            self._total_variation,
+            self._max_diffs[0][1],
+            self._total_variation / (n - 1),
+            n
+        ], dtype=np.float64)
+
+    def _append(self, value):
+        if not self._samples:
+            self._shift = value
+        else:
+            last = self._samples[-1]
+            diff = abs(value - last)
+            self._total_variation += diff
+            if _sign(value) != _sign(last):
+                self._zero_crossings += 1
+            while self._max_diffs and self._max_diffs[-1][1] <= diff:
+                self._max_diffs.pop()
+            self._max_diffs.append((self._seen, diff))
+
+        self._samples.append(value)
+        bisect.insort(self._sorted, value)
+        d = value - self._shift
+        self._sum += d
+        self._sum_sq += d * d
+        self._sum_abs += abs(value)
+        self._energy += value * value
+        self._seen += 1
+
+    def _evict(self):
+        old = self._samples.popleft()
+        new_first = self._samples[0]
+        self._total_variation -= abs(new_first - old)
+        if _sign(new_first) != _sign(old):
+            self._zero_crossings -= 1
+
+        # The diff ending at the new first sample no longer lies inside the window
+        first_index = self._seen - len(self._samples)
+        while self._max_diffs and self._max_diffs[0][0] <= first_index:
+            self._max_diffs.popleft()
+
+        del self._sorted[bisect.bisect_left(self._sorted, old)]
+        d = old - self._shift
+        self._sum -= d
+        self._sum_sq -= d * d
+        self._sum_abs -= abs(old)
+        self._energy -= old * old
+
+        self._evictions += 1
+        if self._evictions % self.resync_every == 0:
+            self._resync()
+
+    def _resync(self):
+        """Recompute the running sums from the buffered samples (amortized O(1) per hop)"""
+        samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+        self._shift = float(samples[0])
+        d = samples - self._shift
+        self._sum = float(np.sum(d))
+        self._sum_sq = float(np.sum(d * d))
+        self._sum_abs = float(np.sum(np.abs(samples)))
+        self._energy = float(np.sum(samples ** 2))
+        self._total_variation = float(np.sum(np.abs(np.diff(samples))))
+
+    @staticmethod
+    def _histogram(ordered, x_min, x_max, bins):
+        """Equal-width bin counts from the sorted window; same bin edges as np.histogram"""
+        if x_min == x_max:
+            x_min, x_max = x_min - 0.5, x_max + 0.5
+        # Inner edges computed like np.linspace (i * step + start), one bisect each;
+        # every bin is [lo, hi) except the last, which also takes the right edge
+        step = (x_max - x_min) / bins
+        cumulative = [0] + [bisect.bisect_left(ordered, i * step + x_min) for i in range(1, bins)] + [len(ordered)]
+        return [hi - lo for lo, hi in zip(cumulative, cumulative[1:])]
+
+
+class VibrationPipeline:
+    """
+    Feature extraction, StandardScaler and classifier fused into one scorer
+
+    Each thread owns preallocated feature, scaled-feature and float32 input
+    buffers (grown to the largest batch it has seen), so scoring a window
+    allocates no intermediate arrays between the stages. The scaler's
+    mean/scale are applied as in-place affine ops, exactly like
+    StandardScaler.transform, and the classifier gets the float32 matrix
+    sklearn's forests would cast to, so the probabilities are unchanged.
+
+    Args:
+        feature_extractor: VibrationFeatureExtractor
+        scaler: fitted StandardScaler
+        classifier: anything with predict_proba, e.g. a CompiledForest
+        initial_rows: rows each thread's buffers start with
+    """
+
+    def __init__(self, feature_extractor, scaler, classifier, initial_rows=32):
+        self.feature_extractor = feature_extractor
+        self.classifier = classifier
+        self.n_features = int(scaler.n_features_in_)
+        # asarray: memory-mapped scaler params (shared weights) stay mapped
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else None
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std and scaler.scale_ is not None else None
+        self.initial_rows = max(1, int(initial_rows))
+        self._local = threading.local()
+
+    def extract(self, windows) -> np.ndarray:
+        """Features of 1-D windows, in this thread's feature buffer (valid until its next call)"""
+        features = self._buffers(len(windows))[0]
+        return self.feature_extractor.extract_ragged(windows, out=features)
+
+    def scale_features(self, features) -> np.ndarray:
+        """(features - mean) / scale into this thread's float32 classifier input"""
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {features.shape}")
+        _, scaled, inputs = self._buffers(len(features))
+        if self.mean is not None:
+            np.subtract(features, self.mean, out=scaled)
+        else:
+            np.copyto(scaled, features)
+        if self.scale is not None:
+            np.divide(scaled, self.scale, out=scaled)
+        np.copyto(inputs, scaled, casting="same_kind")
+        return inputs
+
+    def classify(self, inputs) -> np.ndarray:
+        """Anomaly (class 1) probability per row of scaled features"""
+        return self.classifier.predict_proba(inputs)[:, 1]
+
+    def score(self, windows) -> np.ndarray:
+        return self.classify(self.scale_features(self.extract(windows)))
+
+    def _buffers(self, n):
+        """This thread's (features, scaled, float32 input) buffers, sliced to n rows"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or len(buffers[0]) < n:
+            rows = max(self.initial_rows, 1 << max(0, n - 1).bit_length())
+            buffers = self._local.buffers = (
+                np.empty((rows, self.n_features)),
+                np.empty((rows, self.n_features)),
+                np.empty((rows, self.n_features), dtype=np.float32)
+            )
+        return tuple(buffer[:n] for buffer in buffers)
@@ -0,0 +1,171 @@
+"""
+vision.py
+Optional YOLO person detection for the human-presence score.
+Images are decoded and letterboxed once on a small dedicated thread pool,
+then a micro-batcher packs the images of concurrent requests into a single
+YOLO forward pass. Callers get a future and decide how long to wait for it:
+/predict/intent falls back to PIR when the detection misses its deadline,
+and publishes the final result as a follow-up update once it arrives.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+PERSON_CLASS = 0
+# Ultralytics' padding colour
+LETTERBOX_FILL = 114
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """JPEG/PNG bytes -> RGB uint8 array (H, W, 3)"""
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Image could not be decoded")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def letterbox(image: np.ndarray, size: int) -> np.ndarray:
+    """Resize keeping the aspect ratio and pad to (size, size, 3), centered"""
+    import cv2
+
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_h, new_w = int(round(h * scale)), int(round(w * scale))
+    if (new_h, new_w) != (h, w):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    out = np.full((size, size, 3), LETTERBOX_FILL, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    out[top:top + new_h, left:left + new_w] = image
+    return out
+
+
+class YoloDetector:
+    """
+    Highest person confidence per letterboxed image
+
+    Wraps an ultralytics YOLO model so it takes the (batch, size, size, 3)
+    uint8 arrays the micro-batcher stacks; the images are already letterboxed,
+    so YOLO's own preprocessing is skipped.
+    """
+
+    def __init__(self, model, conf=0.25):
+        self.model = model
+        self.conf = conf
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        import torch
+
+        x = torch.from_numpy(np.ascontiguousarray(images.transpose(0, 3, 1, 2))).float().div_(255.0)
+        results = self.model.predict(x, classes=[PERSON_CLASS], conf=self.conf, verbose=False)
+        confidences = np.zeros(len(images))
+        for i, result in enumerate(results):
+            if len(result.boxes):
+                confidences[i] = float(result.boxes.conf.max())
+        return confidences
+
+
+def load_yolo(path: str, image_size: int, conf=0.25) -> YoloDetector:
+    """Load a YOLO checkpoint and run one warm-up batch"""
+    import torch
+    # Checkpoints pickle the model class, which torch.load only allows once registered
+    from ultralytics.nn.tasks import DetectionModel
+    torch.serialization.add_safe_globals([DetectionModel])
+    from ultralytics import YOLO
+
+    detector = YoloDetector(YOLO(path), conf=conf)
+    detector.predict(np.full((1, image_size, image_size, 3), LETTERBOX_FILL, dtype=np.uint8))
+    return detector
+
+
+class VisionStage:
+    """
+    Decode + letterbox on `pool_size` threads, then batched detection
+
+    Pool threads only prepare images: they hand each one to the batcher and
+    move on, so up to batcher.max_batch_size images can share a forward pass
+    however small the pool is.
+
+    Args:
+        batcher: MicroBatcher over a YoloDetector-style predict function
+        image_size: letterbox size fed to the model
+        pool_size: threads decoding and letterboxing images
+    """
+
+    def __init__(self, batcher, image_size=640, pool_size=2):
+        self.batcher = batcher
+        self.image_size = image_size
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="vision")
+
+    def submit(self, image_bytes: bytes) -> Future:
+        """Future for the image's highest person confidence (0.0 when nobody is detected)"""
+        result = Future()
+        prepared = self._pool.submit(self._prepare, image_bytes)
+        prepared.add_done_callback(lambda f: self._queue_detection(f, result))
+        return result
+
+    def _prepare(self, image_bytes):
+        return letterbox(decode_image(image_bytes), self.image_size)
+
+    def _queue_detection(self, prepared, result):
+        try:
+            detection = self.batcher.submit(prepared.result())
+        except Exception as e:
+            result.set_exception(e)
+            return
+        detection.add_done_callback(lambda f: self._settle(f, result))
+
+    @staticmethod
+    def _settle(detection, result):
+        error = detection.exception()
+        if error is not None:
+            result.set_exception(error)
+        else:
+            result.set_result(float(detection.result()))
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.batcher.close()
+
+
+class PendingUpdates:
+    """
+    Follow-up results of provisional responses, kept for `ttl_seconds`
+
+    A response that went out before its vision result gets an update_id; the
+    final result is stored under it once the detection completes.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, update_id):
+        with self._lock:
+            self._entries[update_id] = (time.monotonic(), None)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resolve(self, update_id, result):
+        with self._lock:
+            if update_id in self._entries:
+                self._entries[update_id] = (time.monotonic(), result)
+
+    def get(self, update_id):
+        """(found, result): result is None while the update is still pending"""
+        with self._lock:
+            entry = self._entries.get(update_id)
+            if entry is None:
+                return False, None
+            created, result = entry
+            if self.ttl > 0 and time.monotonic() - created > self.ttl:
+                del self._entries[update_id]
+                return False, None
+            return True, result